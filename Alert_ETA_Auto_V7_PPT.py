@@ -1,14 +1,34 @@
 # -*- coding: utf-8 -*-
-import pandas as pd
-import tkinter as tk
-from tkinter import filedialog, messagebox
+"""Repeated NGO-Alert report.
+
+Pipeline: load -> normalize -> aggregate -> render Excel / PPT.
+
+Run without arguments for the Tk window, or headless:
+
+    python Alert_ETA_Auto_V7_PPT.py alerts.xlsx -o report.xlsx [--kpi] [--no-ppt]
+
+pptx, xlsxwriter and tkinter are only imported by the stage that needs them.
+Every run writes per-stage timings to a Run_Stats sheet and one JSON log
+line (--stats-log); --profile keeps a profile of the slowest stage.
+The window caches parsed exports like the CLI (--cache-dir, --no-cache)
+and only logs run stats with --stats-log.
+"""
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import math
+import os
 import re
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
-from pptx.chart.data import CategoryChartData
-from pptx.dml.color import RGBColor
-from pptx.enum.shapes import MSO_SHAPE
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
 
 # ---------------------------
 # Chart Styling Helper
@@ -25,12 +45,24 @@ def style_chart(chart, title_text):
 # PPT HELPERS
 # ---------------------------
 def set_slide_background(slide, rgb_color=(230, 240, 250)):
+    from pptx.dml.color import RGBColor
+
     fill = slide.background.fill
     fill.solid()
     fill.fore_color.rgb = RGBColor(*rgb_color)
 
 
 def _add_header(slide, headline_text):
+    _add_header_bar(slide)
+    _add_headline(slide, headline_text)
+    _add_logo(slide)
+
+
+def _add_header_bar(slide):
+    from pptx.util import Inches
+    from pptx.dml.color import RGBColor
+    from pptx.enum.shapes import MSO_SHAPE
+
     # Blue header bar
     header = slide.shapes.add_shape(
         MSO_SHAPE.RECTANGLE,
@@ -43,19 +75,11 @@ def _add_header(slide, headline_text):
     header.fill.fore_color.rgb = RGBColor(79, 121, 191)
     header.line.fill.background()
 
-    # Headline text (left)
-    title_box = slide.shapes.add_textbox(
-        Inches(0.5),
-        Inches(0.2),
-        Inches(9),
-        Inches(0.5)
-    )
-    tf = title_box.text_frame
-    p = tf.paragraphs[0]
-    p.text = headline_text
-    p.font.size = Pt(22)
-    p.font.bold = True
-    p.font.color.rgb = RGBColor(255, 255, 255)
+
+def _add_logo(slide):
+    from pptx.util import Inches, Pt
+    from pptx.dml.color import RGBColor
+    from pptx.enum.shapes import MSO_SHAPE
 
     # Jio logo (right – vector, no image dependency)
     logo = slide.shapes.add_shape(
@@ -77,7 +101,62 @@ def _add_header(slide, headline_text):
     lp.font.color.rgb = RGBColor(255, 255, 255)
     lp.alignment = 1  # center
 
+
+def _add_headline(slide, headline_text):
+    from pptx.util import Inches, Pt
+    from pptx.dml.color import RGBColor
+
+    # Headline text (left)
+    title_box = slide.shapes.add_textbox(
+        Inches(0.5),
+        Inches(0.2),
+        Inches(9),
+        Inches(0.5)
+    )
+    tf = title_box.text_frame
+    p = tf.paragraphs[0]
+    p.text = headline_text
+    p.font.size = Pt(22)
+    p.font.bold = True
+    p.font.color.rgb = RGBColor(255, 255, 255)
+
+
+def _build_template_layout(prs):
+    """Move the header bar, logo and background onto the blank layout once.
+
+    Slides added from the returned layout inherit them, so each slide only
+    carries its headline textbox and charts.
+    """
+    layout = prs.slide_layouts[6]
+    set_slide_background(layout)
+
+    scratch = prs.slides.add_slide(layout)
+    _add_header_bar(scratch)
+    _add_logo(scratch)
+    for shape in list(scratch.shapes):
+        element = shape._element
+        element.xpath('./*[1]/p:cNvPr')[0].set('id', str(layout.shapes._next_shape_id))
+        layout.shapes._spTree.append(element)
+
+    # drop the scratch slide again
+    sld_id = prs.slides._sldIdLst[-1]
+    prs.part.drop_rel(sld_id.rId)
+    prs.slides._sldIdLst.remove(sld_id)
+    return layout
+
+
+def _grid_boxes(cells, left=0.3, top=1.1, width=9.4, height=6.2):
+    """(left, top, width, height) in inches for `cells` charts on one slide."""
+    cols = math.ceil(math.sqrt(cells))
+    rows = math.ceil(cells / cols)
+    w, h = width / cols, height / rows
+    return [(left + (i % cols) * w, top + (i // cols) * h, w, h) for i in range(cells)]
+
 def _add_bar_chart(slide, title, categories, series):
+    from pptx.util import Inches, Pt
+    from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+    from pptx.chart.data import CategoryChartData
+
     chart_data = CategoryChartData()
     chart_data.categories = categories
     for name, values in series:
@@ -103,11 +182,16 @@ def _add_bar_chart(slide, title, categories, series):
         data_labels.font.size = Pt(9)
 
 
-def _add_pie_chart(slide, title, labels, values):
+def _add_pie_chart(slide, title, labels, values, box=(1.5, 1.3, 6.0, 4.8), chart_title=None,
+                   max_slices=10, legend_size=9):
+    from pptx.util import Inches, Pt
+    from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+    from pptx.chart.data import CategoryChartData
+
     data_pairs = sorted(zip(labels, values), key=lambda x: x[1], reverse=True)
-    if len(data_pairs) > 10:
-        top10 = data_pairs[:10]
-        others = data_pairs[10:]
+    if len(data_pairs) > max_slices:
+        top10 = data_pairs[:max_slices]
+        others = data_pairs[max_slices:]
         labels = [l for l,_ in top10] + ["Others"]
         values = [v for _,v in top10] + [sum(v for _,v in others)]
     chart_data = CategoryChartData()
@@ -115,12 +199,17 @@ def _add_pie_chart(slide, title, labels, values):
     chart_data.add_series(title, values)
     chart = slide.shapes.add_chart(
         XL_CHART_TYPE.PIE,
-        Inches(1.5), Inches(1.3), Inches(6.0), Inches(4.8),
+        *(Inches(v) for v in box),
         chart_data
     ).chart
+    if chart_title:
+        chart.has_title = True
+        chart.chart_title.text_frame.text = chart_title
+        chart.chart_title.text_frame.paragraphs[0].font.size = Pt(11)
+        chart.chart_title.text_frame.paragraphs[0].font.bold = True
     chart.has_legend = True
     chart.legend.position = XL_LEGEND_POSITION.RIGHT
-    chart.legend.font.size = Pt(9)
+    chart.legend.font.size = Pt(legend_size)
     plot = chart.plots[0]
     plot.has_data_labels = True
     plot.data_labels.show_percentage = True
@@ -128,29 +217,48 @@ def _add_pie_chart(slide, title, labels, values):
 # ---------------------------
 # PPT GENERATION
 # ---------------------------
-def generate_ppt(ppt_path, category_summary, category_business, eta_business, daily_eta, all_issues, df):
+def generate_ppt(ppt_path, category_summary, category_business, eta_business, daily_eta, app_issues, app_business,
+                 template=False, top_n=None, grid=None, stats=None):
+    """Build the deck.
+
+    template draws the header bar, logo and background once on the slide
+    layout instead of on every slide. top_n keeps only the N applications
+    with the most alerts (largest first); grid packs that many applications
+    per slide (top issues pie, Business / Non-Business in the chart title)
+    instead of two slides per application. stats (RunStats) times the slide
+    building and prs.save separately.
+    """
+    for name, value in (('top_n', top_n), ('grid', grid)):
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be at least 1, got {value}")
+    from pptx import Presentation
+
     prs = Presentation()
+    layout = _build_template_layout(prs) if template else prs.slide_layouts[6]
+
+    def new_slide(headline_text):
+        slide = prs.slides.add_slide(layout)
+        if template:
+            _add_headline(slide, headline_text)
+        else:
+            set_slide_background(slide)
+            _add_header(slide, headline_text)
+        return slide
 
     # Slide 1
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    set_slide_background(slide)
-    _add_header(slide, "Total Alerts per Category")
+    slide = new_slide("Total Alerts per Category")
     _add_bar_chart(slide, "", category_summary['category'].astype(str).tolist(),
                    [('Total Alerts', category_summary['total_issues'].astype(int).tolist())])
 
     # Slide 2
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    set_slide_background(slide)
-    _add_header(slide, "Business vs Non-Business by Category")
+    slide = new_slide("Business vs Non-Business by Category")
     _add_bar_chart(slide, "",
                    category_business['category'].astype(str).tolist(),
                    [('Business', category_business['Business'].tolist()),
                     ('Non-Business', category_business['Non-Business'].tolist())])
 
     # Slide 3
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    set_slide_background(slide)
-    _add_header(slide, "ETA Breach – Business vs Non-Business")
+    slide = new_slide("ETA Breach – Business vs Non-Business")
     yes_row = eta_business[eta_business['ETA_Breach'] == 'Yes'].index[0]
     _add_bar_chart(slide, "",
                    ['Business', 'Non-Business'],
@@ -160,288 +268,2270 @@ def generate_ppt(ppt_path, category_summary, category_business, eta_business, da
                    ])])
 
     # Slide 4
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    set_slide_background(slide)
-    _add_header(slide, "Daily ETA Breach Trend")
+    slide = new_slide("Daily ETA Breach Trend")
     _add_bar_chart(slide, "",
                    daily_eta['createdOn'].astype(str).tolist(),
                    [('Breached Count', daily_eta['Breached_Count'].tolist())])
 
     # Application Slides
-    for app, app_df in all_issues.groupby('applicationName'):
-        slide = prs.slides.add_slide(prs.slide_layouts[6])
-        set_slide_background(slide)
-        _add_header(slide, f"Top 10 Issues – {app}")
+    apps = list(app_issues)
+    if top_n:
+        volume = app_business.sum(axis=1).sort_values(ascending=False, kind='stable')
+        apps = [app for app in volume.index if app in app_issues][:top_n]
+
+    if grid:
+        for start in range(0, len(apps), grid):
+            group = apps[start:start + grid]
+            slide = new_slide(f"Top Issues – Applications {start + 1}–{start + len(group)} of {len(apps)}")
+            for box, (app, app_df, biz) in zip(_grid_boxes(grid), app_tables(app_issues, app_business, group)):
+                top = app_df.head(5)
+                if not top.empty:
+                    _add_pie_chart(slide, "",
+                                   top['example_value'].astype(str).str[:20].tolist(),
+                                   top['repeat_count'].tolist(),
+                                   box=box, chart_title=f"{app} (B {biz['Business']} / NB {biz['Non-Business']})",
+                                   max_slices=5, legend_size=7)
+        if stats is not None:
+            stats.start('ppt save')
+        prs.save(ppt_path)
+        return
+
+    for app, app_df, biz in app_tables(app_issues, app_business, apps):
+        slide = new_slide(f"Top 10 Issues – {app}")
         top10 = app_df.head(10)
         if not top10.empty:
             _add_pie_chart(slide, "",
                            top10['example_value'].astype(str).str[:30].tolist(),
                            top10['repeat_count'].tolist())
 
-        slide = prs.slides.add_slide(prs.slide_layouts[6])
-        set_slide_background(slide)
-        _add_header(slide, f"Business vs Non-Business – {app}")
-        biz = df[df['applicationName'] == app].groupby('Business').size().reindex(
-            ['Business', 'Non-Business'], fill_value=0)
+        slide = new_slide(f"Business vs Non-Business – {app}")
         _add_bar_chart(slide, "", ['Business', 'Non-Business'], [('Count', biz.tolist())])
 
+    if stats is not None:
+        stats.start('ppt save')
     prs.save(ppt_path)
 
 # ---------------------------
-# Main Logic
+# RUN STATS
 # ---------------------------
-def process_excel():
-    file_path = filedialog.askopenfilename(title="Select Excel file", filetypes=[("Excel files","*.xlsx *.xls")])
-    if not file_path:
-        return
+# Wall time, CPU time, peak RSS and row counts per pipeline stage. Stages
+# run one after another: starting a stage closes the open one, and a stage
+# that runs once per chunk accumulates into one record. With a profile path
+# every stage is profiled and only the slowest one is written out: a .html
+# path uses pyinstrument, anything else is a cProfile dump (pstats, snakeviz).
+STATS_COLUMNS = ['stage', 'calls', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows_in', 'rows_out']
+
+
+class RunCancelled(Exception):
+    """Raised at the next stage (or chunk) boundary after RunStats.cancel()."""
+
+
+def rss_bytes():
+    """Current resident set size, or None where it cannot be read."""
     try:
-        df = pd.read_excel(file_path)
-        logic_col = 'kpiName' if use_kpi_var.get() else 'title'
-        clean_col = f"{logic_col}_clean"
-        required_cols = ['ipAddress', logic_col, 'category','applicationName','ackMetStatus','createdOn','environment','latestUpdCategory']
-        missing = [c for c in required_cols if c not in df.columns]
-        if missing:
-            messagebox.showerror("Error", f"Missing columns: {missing}")
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().rss
+
+
+class PeakRss:
+    """Background thread keeping the highest RSS seen while active."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = self.start = 0
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes() or 0)
+
+
+def _new_profiler(profile_path):
+    if profile_path.lower().endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ValueError("pyinstrument is not installed; use a .prof path for a cProfile dump") from None
+        return Profiler()
+    import cProfile
+
+    return cProfile.Profile()
+
+
+def _save_profile(profiler, path):
+    if hasattr(profiler, 'dump_stats'):
+        profiler.dump_stats(path)
+    else:
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(profiler.output_html())
+
+
+class RunStats:
+    """Per-stage measurements of one run, for the Run_Stats sheet and the JSON log.
+
+    listener(event, stage, record) is called with 'start' / 'stop' for each
+    stage (from the thread running the pipeline). cancel() makes the next
+    start() raise RunCancelled.
+    """
+
+    def __init__(self, profile_path=None, listener=None):
+        if profile_path:
+            _new_profiler(profile_path)  # fail before the run if pyinstrument is missing
+        self.profile_path = profile_path
+        self.listener = listener
+        self.cancelled = threading.Event()
+        self.records = {}
+        self.profile = self.slowest = None
+        self._open = None
+        self._profiles = {}
+        self._pending = []
+        self._t0, self._cpu0 = time.perf_counter(), time.process_time()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise RunCancelled("Run cancelled")
+
+    def start(self, name, rows_in=None):
+        self.stop()
+        self.check_cancelled()
+        record = self.records.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0,
+                                                'rows_in': None, 'rows_out': None})
+        record['calls'] += 1
+        self._count(record, 'rows_in', rows_in)
+        profiler = None
+        if self.profile_path:
+            profiler = self._profiles.get(name) or self._profiles.setdefault(name, _new_profiler(self.profile_path))
+        rss = PeakRss().__enter__()
+        self._open = (name, time.perf_counter(), time.process_time(), rss, profiler)
+        if profiler is not None:
+            (profiler.enable if hasattr(profiler, 'enable') else profiler.start)()
+        if self.listener is not None:
+            self.listener('start', name, record)
+
+    def stop(self, rows_out=None):
+        """Close the open stage (if any)."""
+        if self._open is None:
             return
+        name, wall0, cpu0, rss, profiler = self._open
+        self._open = None
+        if profiler is not None:
+            (profiler.disable if hasattr(profiler, 'disable') else profiler.stop)()
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        rss.__exit__(None, None, None)
+        record = self.records[name]
+        record['wall_s'] += wall
+        record['cpu_s'] += cpu
+        record['peak_rss_mb'] = max(record['peak_rss_mb'], rss.peak / 1024 ** 2)
+        self._count(record, 'rows_out', rows_out)
+        if self.listener is not None:
+            self.listener('stop', name, record)
+
+    @staticmethod
+    def _count(record, key, rows):
+        if rows is not None:
+            record[key] = (record[key] or 0) + int(rows)
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        """with stats.stage(name) as counts: ...; counts['rows_out'] = n"""
+        counts = {}
+        self.start(name, rows_in)
+        try:
+            yield counts
+        finally:
+            self._count(self.records[name], 'rows_in', counts.get('rows_in'))
+            self.stop(counts.get('rows_out'))
+
+    def iter_stage(self, name, chunks):
+        """Yield from chunks, timing each fetch as one call of stage name."""
+        chunks = iter(chunks)
+        while True:
+            with self.stage(name) as counts:
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    counts['rows_out'] = len(chunk)
+            if chunk is None:
+                return
+            yield chunk
+
+    def add(self, records, profiles=None):
+        """Merge stage records (and {stage: profile file}) measured in another process."""
+        self.records.update(records)
+        self._profiles.update(profiles or {})
+        if self.listener is not None:
+            for name, record in records.items():
+                self.listener('stop', name, record)
+
+    def defer(self, collect):
+        """Register collect() to be called before the stats are next read."""
+        self._pending.append(collect)
+
+    def collect(self):
+        while self._pending:
+            self._pending.pop(0)()
+
+    def summary(self):
+        """Stage records plus a 'total' row, as dicts in STATS_COLUMNS order."""
+        self.collect()
+        rows = [{'stage': name, **record} for name, record in self.records.items()]
+        peak = max([r['peak_rss_mb'] for r in rows] + [(rss_bytes() or 0) / 1024 ** 2])
+        rows.append({'stage': 'total', 'calls': None, 'wall_s': time.perf_counter() - self._t0,
+                     'cpu_s': time.process_time() - self._cpu0, 'peak_rss_mb': peak,
+                     'rows_in': None, 'rows_out': None})
+        for row in rows:
+            for key in ('wall_s', 'cpu_s', 'peak_rss_mb'):
+                row[key] = round(row[key], 3)
+        return rows
+
+    def frame(self):
+        return pd.DataFrame(self.summary(), columns=STATS_COLUMNS)
+
+    def finish(self):
+        """Close the open stage and write the slowest stage's profile to profile_path."""
+        self.stop()
+        self.collect()
+        if self.records:
+            self.slowest = max(self.records, key=lambda name: self.records[name]['wall_s'])
+        for name, profiler in self._profiles.items():
+            if isinstance(profiler, str):
+                if name == self.slowest:
+                    os.replace(profiler, self.profile_path)
+                elif os.path.exists(profiler):
+                    os.remove(profiler)
+            elif name == self.slowest:
+                _save_profile(profiler, self.profile_path)
+        if self.slowest in self._profiles:
+            self.profile = self.profile_path
+        self._profiles = {}
+        return self
+
+    def json_line(self, **context):
+        return json.dumps({'event': 'run_stats', **context, 'stages': self.summary(),
+                           'slowest': self.slowest, 'profile': self.profile}, default=str)
+
+
+def _stage(stats, name, rows_in=None):
+    """stats.stage(...), or a no-op when stats is None."""
+    return stats.stage(name, rows_in) if stats is not None else contextlib.nullcontext({})
+
+
+def log_run_stats(stats, log_path=None, **context):
+    """Finish stats and emit them as one JSON line, appended to log_path or printed to stderr."""
+    line = stats.finish().json_line(**context)
+    if not log_path:
+        print(line, file=sys.stderr)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as fh:
+        fh.write(line + '\n')
+
+# ---------------------------
+# PIPELINE: LOAD
+# ---------------------------
+def logic_columns(use_kpi=False):
+    """Return (logic_col, clean_col) for the Title / KPI grouping switch."""
+    logic_col = 'kpiName' if use_kpi else 'title'
+    return logic_col, f"{logic_col}_clean"
+
+
+def required_columns(logic_col):
+    return ['ipAddress', logic_col, 'category','applicationName','ackMetStatus','createdOn','environment','latestUpdCategory']
+
 
-        # Normalize Title / KPI
-        df[clean_col] = (
-            df[logic_col].astype(str).str.lower()
-            .apply(lambda x: re.sub(r'\d+', '<num>', x))
+# Low-cardinality columns kept as categoricals from ingestion onwards.
+# Label categories are sorted so groupby output keeps the plain-string order.
+CATEGORY_COLS = ['applicationName','category','environment','latestUpdCategory','ackMetStatus']
+ETA_LABELS = ['No','Yes']
+BUSINESS_LABELS = ['Business','Non-Business']
+CSV_EXTS = ('.csv', '.txt')
+PARQUET_EXTS = ('.parquet', '.pq')
+CHUNK_ROWS = 200000
+INPUT_FILETYPES = [("Alert exports","*.xlsx *.xls *.csv *.parquet"),("Excel files","*.xlsx *.xls"),
+                   ("CSV files","*.csv"),("Parquet files","*.parquet *.pq")]
+
+
+def _as_category(series):
+    """Categorical with sorted categories, so groupby order matches plain strings."""
+    series = series.astype('category')
+    try:
+        return series.cat.reorder_categories(sorted(series.cat.categories))
+    except TypeError:
+        return series  # mixed types: keep appearance order
+
+
+def read_alerts(file_path, columns=None):
+    """Read an xlsx/xls, CSV or Parquet export, limited to `columns` when given."""
+    ext = os.path.splitext(file_path)[1].lower()
+    usecols = None if columns is None else (lambda c: c in columns)
+    if ext in CSV_EXTS:
+        dtype = {c: 'category' for c in CATEGORY_COLS}
+        return pd.read_csv(file_path, usecols=usecols, dtype=dtype)
+    if ext in PARQUET_EXTS:
+        import pyarrow.parquet as pq
+
+        names = pq.read_schema(file_path).names
+        if columns is not None:
+            names = [c for c in names if c in columns]
+        return pd.read_parquet(file_path, columns=names)
+    return pd.read_excel(file_path, usecols=usecols)
+
+
+def load_alerts(file_path, use_kpi=False, all_columns=False):
+    """Read the alert export and check the columns the report needs.
+
+    Only the required columns are read unless all_columns is set (the full
+    export then also goes to the ETA_Alert sheet). Low-cardinality columns
+    come back as categoricals.
+    """
+    logic_col, _ = logic_columns(use_kpi)
+    required = required_columns(logic_col)
+    df = read_alerts(file_path, None if all_columns else set(required))
+    return _prepare_alerts(df, required)
+
+
+def _prepare_alerts(df, required):
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    for col in CATEGORY_COLS:
+        df[col] = _as_category(df[col])
+    return df
+
+
+def _iter_xlsx_chunks(file_path, columns, chunk_rows):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        keep = [i for i, c in enumerate(header) if c is not None and (columns is None or c in columns)]
+        names = [header[i] for i in keep]
+        buf = []
+        emitted = False
+        for row in rows:
+            if all(v is None for v in row):
+                continue  # read_excel skips blank rows too
+            buf.append([row[i] if i < len(row) else None for i in keep])
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame(buf, columns=names)
+                buf = []
+                emitted = True
+        if buf or not emitted:
+            yield pd.DataFrame(buf, columns=names)  # header-only files still get a column check
+    finally:
+        wb.close()
+
+
+def iter_alert_chunks(file_path, columns=None, chunk_rows=CHUNK_ROWS):
+    """Yield the export in DataFrames of at most chunk_rows rows.
+
+    xlsx goes through openpyxl read-only mode, CSV through read_csv
+    chunks and Parquet through pyarrow record batches.
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be at least 1, got {chunk_rows}")
+    ext = os.path.splitext(file_path)[1].lower()
+    usecols = None if columns is None else (lambda c: c in columns)
+    if ext in CSV_EXTS:
+        dtype = {c: 'category' for c in CATEGORY_COLS}
+        with pd.read_csv(file_path, usecols=usecols, dtype=dtype, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif ext in PARQUET_EXTS:
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(file_path)
+        names = pf.schema_arrow.names
+        if columns is not None:
+            names = [c for c in names if c in columns]
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=names):
+            yield batch.to_pandas()
+    else:
+        yield from _iter_xlsx_chunks(file_path, columns, chunk_rows)
+
+# ---------------------------
+# PIPELINE: NORMALIZE
+# ---------------------------
+# Placeholder rules for the clean Title / KPI key, tried left to right at
+# each position. Input is already lower-cased. 'num' is the original rule;
+# the others are opt-in and must come before it or their digits are eaten.
+# 'host' needs a dotted name with a digit in its first label (web01.corp.net)
+# so words like eth0, ipv4 or sda1 are left to 'num'.
+NORMALIZE_RULES = {
+    'ts': (r'\d{4}-\d{2}-\d{2}[ t]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?|\d{2}:\d{2}:\d{2}', '<ts>'),
+    'uuid': (r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', '<uuid>'),
+    'ip': (r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b', '<ip>'),
+    'host': (r'\b[a-z][a-z0-9-]*\d[a-z0-9-]*(?:\.[a-z][a-z0-9-]*)+\b', '<host>'),
+    'num': (r'\d+', '<num>'),
+}
+DEFAULT_NORMALIZE_RULES = ('num',)
+NORMALIZE_MEMO_MAX = 500000
+
+
+def compile_normalize_rules(rules=DEFAULT_NORMALIZE_RULES):
+    """Compile the named rules into one alternation so a title is scanned once."""
+    unknown = [r for r in rules if r not in NORMALIZE_RULES]
+    if unknown:
+        raise ValueError(f"Unknown normalize rules: {unknown}")
+    if not rules:
+        raise ValueError("No normalize rules given")
+    ordered = [r for r in NORMALIZE_RULES if r in rules]
+    pattern = re.compile('|'.join(f"(?P<{r}>{NORMALIZE_RULES[r][0]})" for r in ordered))
+    placeholders = {r: NORMALIZE_RULES[r][1] for r in ordered}
+    return pattern, placeholders
+
+
+def _load_normalize_memo(memo_path, signature):
+    if not memo_path or not os.path.exists(memo_path):
+        return {}
+    try:
+        with open(memo_path, encoding='utf-8') as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    if data.get('signature') != signature:
+        return {}
+    return data.get('memo', {})
+
+
+def _save_normalize_memo(memo_path, signature, memo):
+    if len(memo) > NORMALIZE_MEMO_MAX:
+        # dicts keep insertion order: keep the most recently added titles
+        memo = dict(list(memo.items())[-NORMALIZE_MEMO_MAX:])
+    tmp_path = f"{memo_path}.{os.getpid()}.tmp"  # batch workers may save concurrently
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        json.dump({'signature': signature, 'memo': memo}, fh)
+    os.replace(tmp_path, memo_path)
+
+
+def normalize_titles(raw, rules=DEFAULT_NORMALIZE_RULES, memo_path=None, memo=None):
+    """Return the clean key for a Title / KPI column as a Categorical.
+
+    The regex work runs once per distinct raw value and is mapped back to
+    rows through factorize codes. With memo_path, clean values are also kept
+    in a JSON memo so titles seen in earlier runs are not normalized again.
+    A caller-owned `memo` dict (e.g. shared across chunks) is updated in
+    place and never written to disk here.
+    """
+    pattern, placeholders = compile_normalize_rules(rules)
+    codes, uniques = pd.factorize(raw, use_na_sentinel=False)
+    uniques = pd.Series([str(u) for u in uniques], dtype=object)
+
+    signature = pattern.pattern
+    if memo is None:
+        memo = _load_normalize_memo(memo_path, signature)
+    else:
+        memo_path = None
+    todo = uniques[~uniques.isin(memo.keys())] if memo else uniques
+    if len(todo):
+        cleaned = (
+            todo.str.lower()
+            .str.replace(pattern, lambda m: placeholders[m.lastgroup], regex=True)
             .str.replace(r'[^a-z0-9 <>]', ' ', regex=True)
             .str.replace(r'\s+', ' ', regex=True)
             .str.strip()
         )
+        memo.update(zip(todo.tolist(), cleaned.tolist()))
+        if memo_path:
+            _save_normalize_memo(memo_path, signature, memo)
+    clean_uniques = uniques.map(memo).to_numpy(dtype=object)
+
+    # sorted categories keep groupby output in the same order as plain strings
+    clean_codes, categories = pd.factorize(clean_uniques, sort=True)
+    return pd.Categorical.from_codes(clean_codes[codes], categories=categories)
+
+def _map_categories(series, func, categories=None, missing=None):
+    """Apply a string transform to a categorical's categories and remap the codes.
+
+    Values that merge (e.g. 'y' and 'Y') share one category afterwards.
+    Missing rows become `missing`, or stay missing when it is None.
+    """
+    series = _as_category(series)
+    mapped = func(pd.Series(series.cat.categories, dtype=object))
+    if categories is None:
+        codes, categories = pd.factorize(mapped, sort=True)
+    else:
+        codes = pd.Index(categories).get_indexer(mapped)
+    row_codes = series.cat.codes.to_numpy()
+    fill = -1 if missing is None else list(categories).index(missing)
+    row_codes = np.where(row_codes >= 0, codes[row_codes] if len(codes) else -1, fill)
+    return pd.Categorical.from_codes(row_codes, categories=categories)
+
+
+def _category_mask(series, func):
+    """Per-row boolean from a test evaluated once per category (missing -> False)."""
+    series = _as_category(series)
+    hits = func(pd.Series(series.cat.categories, dtype=object)).fillna(False).to_numpy(dtype=bool)
+    codes = series.cat.codes.to_numpy()
+    return np.where(codes >= 0, hits[codes] if len(hits) else False, False)
+
+
+def normalize_alerts(df, use_kpi=False, rules=DEFAULT_NORMALIZE_RULES, memo_path=None, memo=None, stats=None,
+                     calendar=None):
+    """Add the clean Title / KPI key, ETA_Breach and Business columns (in place)."""
+    logic_col, clean_col = logic_columns(use_kpi)
+
+    # Normalize Title / KPI (once per distinct raw value)
+    with _stage(stats, 'normalize', len(df)) as counts:
+        df[clean_col] = normalize_titles(df[logic_col], rules, memo_path, memo)
+        counts['rows_out'] = len(df)
+    with _stage(stats, 'classify', len(df)) as counts:
+        classify_alerts(df, calendar)
+        counts['rows_out'] = len(df)
+    return df
+
+
+def classify_alerts(df, calendar=None):
+    """Add ETA_Breach and Business (in place); createdOn becomes datetime.
+
+    calendar (BusinessCalendar) replaces the fixed 07:00-23:00 business hours
+    and says how createdOn is parsed.
+    """
+    # ETA Logic (string work runs on the categories, not the rows)
+    df['ackMetStatus'] = _map_categories(df['ackMetStatus'], lambda c: c.astype(str).str.upper().str.strip())
+    df['ETA_Breach'] = _map_categories(df['ackMetStatus'], lambda c: c.map({'Y':'No','N':'Yes','X':'Yes'}).fillna('Yes'),
+                                       ETA_LABELS, missing='Yes')
+    df['createdOn'] = parse_created_on(df['createdOn'], calendar.date_format if calendar is not None else None)
+    df['environment'] = _map_categories(df['environment'], lambda c: c.astype(str).str.upper())
+    df['latestUpdCategory'] = _map_categories(df['latestUpdCategory'], lambda c: c.astype(str).str.upper())
+
+    if calendar is None:
+        hour = df['createdOn'].dt.hour
+        business_hour = ((hour >=7) & (hour <23)).to_numpy()
+        env_pattern, cr_pattern = 'DR|REPLICA', 'SUPPRESSED BY CR'
+    else:
+        business_hour = calendar.business_hours(df)
+        env_pattern, cr_pattern = calendar.exclude_environment, calendar.exclude_update
+    exclude_env = _category_mask(df['environment'], lambda c: c.str.contains(env_pattern, regex=True))
+    exclude_cr = _category_mask(df['latestUpdCategory'], lambda c: c.str.contains(cr_pattern, regex=True))
+
+    business = business_hour & ~exclude_env & ~exclude_cr
+    df['Business'] = pd.Categorical.from_codes(np.where(business, 0, 1), categories=BUSINESS_LABELS)
+    return df
+
+# ---------------------------
+# PIPELINE: BUSINESS CALENDAR
+# ---------------------------
+# Business / Non-Business from a JSON config instead of the fixed 07-23 rule:
+#
+#   {"default": {"hours": ["07:00-23:00"], "weekend": ["sat", "sun"]},
+#    "holidays": ["2026-01-26", "2026-08-15"],
+#    "categories": {"Network": {"hours": ["00:00-24:00"], "weekend": []}},
+#    "applications": {"APP_0001": {"hours": ["09:00-18:00"], "days": {"sat": ["10:00-14:00"]}}}}
+#
+# A schedule has support "hours" on every day not in "weekend", "days"
+# overriding the windows of single weekdays, extra "holidays" of its own
+# and "observe_holidays" (false for 24x7 teams). Application schedules win
+# over category ones; both inherit unset fields from "default" (except
+# "holidays"). A window ending before it starts runs past midnight.
+# "exclude_environment" / "exclude_update" are regexes on the upper-cased
+# values (default DR|REPLICA and SUPPRESSED BY CR) that are never Business.
+# Each schedule becomes sorted minute-of-week window boundaries, offset by
+# schedule, so one searchsorted over all rows classifies every alert.
+DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+HOLIDAY_STRIDE = 1 << 24  # days per schedule in the holiday keys
+SCHEDULE_FIELDS = {'hours', 'weekend', 'days', 'holidays', 'observe_holidays'}
+DEFAULT_SCHEDULE = {'hours': ['07:00-23:00'], 'weekend': [], 'days': {}, 'holidays': [], 'observe_holidays': True}
+CALENDAR_FIELDS = {'default', 'holidays', 'categories', 'applications', 'exclude_environment', 'exclude_update'}
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+
+def parse_created_on(values, date_format=None):
+    """createdOn as datetime64.
+
+    Already-parsed values pass through; date_format 'excel' reads Excel
+    serial days; otherwise date_format is a strftime format that skips
+    pandas' format inference, or None for pd.to_datetime's own rules.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if date_format == 'excel':
+        seconds = np.round(pd.to_numeric(values).to_numpy(dtype=float) * 86400)
+        return pd.Series(EXCEL_EPOCH + pd.to_timedelta(seconds, unit='s'), index=values.index)
+    if date_format:
+        return pd.to_datetime(values, format=date_format)
+    return pd.to_datetime(values)
+
+
+def _window_minutes(text):
+    try:
+        start, end = (int(h) * 60 + int(m) for h, m in (part.strip().split(':') for part in text.split('-')))
+    except ValueError:
+        start = end = -1
+    if not (0 <= start <= DAY_MINUTES and 0 <= end <= DAY_MINUTES):
+        raise ValueError(f"Bad support window {text!r} (expected HH:MM-HH:MM)")
+    return start, end
+
+
+def _week_boundaries(schedule):
+    """Sorted [start, end, start, end, ...] minute-of-week edges of a schedule's windows."""
+    unknown = set(schedule['days']) - set(DAY_NAMES) or set(schedule['weekend']) - set(DAY_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown weekday {sorted(unknown)[0]!r} (use {', '.join(DAY_NAMES)})")
+    intervals = []
+    for day, name in enumerate(DAY_NAMES):
+        if name in schedule['days']:
+            windows = schedule['days'][name]
+        else:
+            windows = [] if name in schedule['weekend'] else schedule['hours']
+        for start, end in map(_window_minutes, windows):
+            if end < start:
+                end += DAY_MINUTES
+            start, end = start + day * DAY_MINUTES, end + day * DAY_MINUTES
+            if end > WEEK_MINUTES:  # Sunday night into Monday
+                intervals.append((0, end - WEEK_MINUTES))
+                end = WEEK_MINUTES
+            if end > start:
+                intervals.append((start, end))
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return np.array(merged, dtype=np.int64).reshape(-1)
+
+
+def _day_numbers(dates):
+    try:
+        return np.array(dates, dtype='datetime64[D]').astype(np.int64)
+    except ValueError:
+        raise ValueError(f"Bad holiday in {list(dates)} (expected YYYY-MM-DD)") from None
+
+
+class BusinessCalendar:
+    """Support-hours calendar for the Business / Non-Business split (see above)."""
+
+    def __init__(self, config=None, date_format=None):
+        config = config or {}
+        unknown = set(config) - CALENDAR_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown calendar setting(s): {sorted(unknown)}")
+        self.date_format = date_format
+        self.signature = hashlib.sha256(json.dumps([config, date_format], sort_keys=True).encode()).hexdigest()[:12]
+        self.exclude_environment = config.get('exclude_environment', 'DR|REPLICA')
+        self.exclude_update = config.get('exclude_update', 'SUPPRESSED BY CR')
+
+        default = {**DEFAULT_SCHEDULE, **config.get('default', {})}
+        schedules = [default]
+        self.by_category, self.by_application = {}, {}
+        for section, lookup in (('categories', self.by_category), ('applications', self.by_application)):
+            for key, schedule in config.get(section, {}).items():
+                lookup[str(key).strip()] = len(schedules)
+                schedules.append({**default, 'holidays': [], **schedule})
+        shared_holidays = _day_numbers(config.get('holidays', []))
+
+        boundaries, holidays = [], []
+        for i, schedule in enumerate(schedules):
+            unknown = set(schedule) - SCHEDULE_FIELDS
+            if unknown:
+                raise ValueError(f"Unknown schedule setting(s): {sorted(unknown)}")
+            boundaries.append(_week_boundaries(schedule) + i * WEEK_MINUTES)
+            days = _day_numbers(schedule['holidays'])
+            if schedule['observe_holidays']:
+                days = np.concatenate([days, shared_holidays])
+            holidays.append(days + i * HOLIDAY_STRIDE)
+        self.boundaries = np.concatenate(boundaries)
+        self.holidays = np.unique(np.concatenate(holidays))
+
+    def _schedule_ids(self, df):
+        ids = np.zeros(len(df), dtype=np.int64)
+        for col, lookup in (('category', self.by_category), ('applicationName', self.by_application)):
+            if not lookup or col not in df.columns:
+                continue
+            series = _as_category(df[col])
+            per_value = np.array([lookup.get(str(v).strip(), -1) for v in series.cat.categories] + [-1], dtype=np.int64)
+            hits = per_value[series.cat.codes.to_numpy()]  # code -1 (missing) picks the trailing -1
+            ids = np.where(hits >= 0, hits, ids)
+        return ids
+
+    def business_hours(self, df):
+        """Boolean array: createdOn falls in its schedule's support window and is not a holiday."""
+        created = df['createdOn']
+        if getattr(created.dt, 'tz', None) is not None:
+            created = created.dt.tz_localize(None)
+        valid = created.notna().to_numpy()
+        minutes = created.to_numpy().astype('datetime64[m]').astype(np.int64)
+        days = minutes // DAY_MINUTES
+        weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+        ids = self._schedule_ids(df)
+        week_minute = ids * WEEK_MINUTES + weekday * DAY_MINUTES + (minutes - days * DAY_MINUTES)
+        inside = np.searchsorted(self.boundaries, week_minute, side='right') % 2 == 1
+        holiday_keys = ids * HOLIDAY_STRIDE + days
+        pos = np.minimum(np.searchsorted(self.holidays, holiday_keys), max(len(self.holidays) - 1, 0))
+        holiday = self.holidays[pos] == holiday_keys if len(self.holidays) else np.zeros(len(df), dtype=bool)
+        return valid & inside & ~holiday
+
+
+def load_calendar(config_path=None, date_format=None):
+    """BusinessCalendar from a JSON config file and/or a createdOn format, or None for the built-in rule."""
+    if not config_path and not date_format:
+        return None
+    config = None
+    if config_path:
+        try:
+            with open(config_path, encoding='utf-8') as fh:
+                config = json.load(fh)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read calendar {config_path}: {e}") from None
+    return BusinessCalendar(config, date_format)
+
+# ---------------------------
+# PIPELINE: NEAR-DUPLICATE CLUSTERS
+# ---------------------------
+# Optional merge of clean titles that differ by a host, path or word order.
+# Each distinct title becomes its set of word tokens; MinHash signatures
+# estimate the Jaccard similarity of those sets and LSH banding only pairs
+# titles that share a whole band, so the cost is linear in the number of
+# distinct titles. Candidates are checked against the threshold before
+# they are merged. Hashes are crc32-based, so clusters are stable across runs.
+DEFAULT_CLUSTER_THRESHOLD = 0.7
+CLUSTER_PERMUTATIONS = 128
+CLUSTER_PRIME = (1 << 31) - 1
+CLUSTER_BLOCK = 16
+
+
+def _lsh_bands(threshold, num_perm):
+    """(bands, rows) whose collision threshold (1/b)^(1/r) is the highest at or below threshold."""
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def minhash_signatures(titles, num_perm=CLUSTER_PERMUTATIONS, seed=1):
+    """(len(titles), num_perm) MinHash signatures of each title's word-token set."""
+    token_sets = [sorted(set(re.findall(r'\w+', str(t).lower()))) or [str(t)] for t in titles]
+    if not token_sets:
+        return np.empty((0, num_perm), dtype=np.int64)
+    sizes = np.array([len(s) for s in token_sets])
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    codes, uniques = pd.factorize(pd.Series([tok for s in token_sets for tok in s], dtype=object))
+    hashes = np.array([zlib.crc32(u.encode('utf-8')) for u in uniques], dtype=np.int64)[codes] % CLUSTER_PRIME
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, CLUSTER_PRIME, num_perm, dtype=np.int64)
+    b = rng.integers(0, CLUSTER_PRIME, num_perm, dtype=np.int64)
+    signatures = np.empty((len(token_sets), num_perm), dtype=np.int64)
+    for lo in range(0, num_perm, CLUSTER_BLOCK):
+        hi = min(lo + CLUSTER_BLOCK, num_perm)
+        permuted = (hashes[:, None] * a[lo:hi] + b[lo:hi]) % CLUSTER_PRIME
+        signatures[:, lo:hi] = np.minimum.reduceat(permuted, starts, axis=0)
+    return signatures
+
+
+def _connected_labels(n, left, right):
+    """Smallest member index of each node's connected component."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        merged = labels.copy()
+        np.minimum.at(merged, left, low)
+        np.minimum.at(merged, right, low)
+        merged = merged[merged]
+        if np.array_equal(merged, labels):
+            return labels
+        labels = merged
+
+
+def cluster_titles(titles, threshold=DEFAULT_CLUSTER_THRESHOLD, num_perm=CLUSTER_PERMUTATIONS):
+    """Cluster label per title (the index of the cluster's first title).
+
+    Titles land in one cluster when a chain of them has estimated token
+    Jaccard similarity >= threshold.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError(f"Cluster threshold must be in (0, 1], got {threshold}")
+    n = len(titles)
+    if n < 2:
+        return np.arange(n)
+    signatures = minhash_signatures(titles, num_perm)
+    bands, rows = _lsh_bands(threshold, num_perm)
+    weights = np.random.default_rng(0).integers(1, 1 << 62, rows, dtype=np.int64)
+    left, right = [], []
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows]
+        keys = (block * weights).sum(axis=1)  # wraps on overflow; collisions are caught below
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        first = np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])
+        anchor = order[np.maximum.accumulate(np.where(first, np.arange(n), 0))]
+        candidates = order[~first]
+        anchors = anchor[~first]
+        similar = (signatures[candidates] == signatures[anchors]).mean(axis=1) >= threshold
+        left.append(candidates[similar])
+        right.append(anchors[similar])
+    return _connected_labels(n, np.concatenate(left), np.concatenate(right))
+
+
+def cluster_cube(cube, use_kpi=False, threshold=DEFAULT_CLUSTER_THRESHOLD):
+    """Replace the clean Title / KPI key with its cluster's key and re-aggregate.
+
+    A cluster is keyed by its member with the most alerts (earliest example
+    on ties), so the cluster id stays a readable clean title.
+    """
+    _, clean_col = logic_columns(use_kpi)
+    keys = _as_category(cube[clean_col])
+    titles = keys.cat.categories
+    if len(titles) < 2:
+        return cube
+    codes = keys.cat.codes.to_numpy()
+    valid = codes >= 0
+    totals = np.bincount(codes[valid], weights=cube['count'].to_numpy()[valid], minlength=len(titles))
+    earliest = pd.Series(cube['first_row'].to_numpy()[valid]).groupby(codes[valid]).min()\
+                 .reindex(range(len(titles)), fill_value=np.iinfo(np.int64).max).to_numpy()
+    labels = cluster_titles(list(titles), threshold)
+    ranking = np.lexsort((earliest, -totals, labels))
+    first = np.concatenate([[True], labels[ranking][1:] != labels[ranking][:-1]])
+    leader = pd.Series(ranking[first], index=labels[ranking][first])
+    representative = np.asarray(titles, dtype=object)[leader.reindex(labels).to_numpy()]
+
+    clustered = cube.copy()
+    clustered[clean_col] = pd.Series(np.where(valid, representative[np.where(valid, codes, 0)], None),
+                                     index=cube.index, dtype=object)
+    return _collapse_cube(clustered, use_kpi)
+
+# ---------------------------
+# PIPELINE: INPUT CACHE
+# ---------------------------
+# Parsed exports are kept as Parquet under the cache dir, keyed by the
+# file's sha256 (re-hashed only when size/mtime change). Both title and
+# kpiName clean columns are stored, so flipping the KPI switch is a hit.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ngo_alert_report')
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_VERSION = 1
+LOGIC_COLS = ('title', 'kpiName')
+
+
+def _file_digest(file_path, cache_dir):
+    st = os.stat(file_path)
+    index_path = os.path.join(cache_dir, 'index.json')
+    try:
+        with open(index_path, encoding='utf-8') as fh:
+            index = json.load(fh)
+    except (OSError, ValueError):
+        index = {}
+    key = os.path.abspath(file_path)
+    entry = index.get(key)
+    if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+        return entry['sha256']
+
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            h.update(block)
+    index[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': h.hexdigest()}
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        json.dump(index, fh)
+    os.replace(tmp_path, index_path)
+    return index[key]['sha256']
+
+
+def _evict_cache(cache_dir, max_bytes, keep=None):
+    """Drop least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith('.parquet') and path != keep:
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    if keep and os.path.exists(keep):
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+def _cached_view(cached, use_kpi, all_columns):
+    """Columns an uncached load + normalize would have, in the same order."""
+    logic_col, clean_col = logic_columns(use_kpi)
+    required = required_columns(logic_col)
+    missing = [c for c in required if c not in cached.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    clean_cols = {f"{c}_clean" for c in LOGIC_COLS}
+    cols = [c for c in cached.columns if c not in clean_cols and (all_columns or c in required)]
+    return cached[cols + [clean_col]].copy()
+
+
+def load_cached(file_path, cache_dir, use_kpi=False, rules=DEFAULT_NORMALIZE_RULES, memo_path=None,
+                all_columns=False, max_bytes=CACHE_MAX_BYTES, stats=None, calendar=None):
+    """load_alerts() + normalize_alerts() backed by the parsed-input cache.
+
+    On a miss the export is parsed once with both Title and KPI columns,
+    createdOn is converted and both clean keys are built, then the frame is
+    written to the cache (skipped quietly when pyarrow is missing or the
+    data cannot be stored as Parquet).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    signature = compile_normalize_rules(rules)[0].pattern
+    date_format = calendar.date_format if calendar is not None else None
+    variant = hashlib.sha256(f"{CACHE_VERSION}|{all_columns}|{signature}|{date_format or ''}".encode()).hexdigest()[:12]
+    cache_path = os.path.join(cache_dir, f"{_file_digest(file_path, cache_dir)[:32]}_{variant}.parquet")
+
+    cached = None
+    if os.path.exists(cache_path):
+        with _stage(stats, 'ingest (cache hit)') as counts:
+            try:
+                cached = pd.read_parquet(cache_path)
+                os.utime(cache_path)
+                counts['rows_out'] = len(cached)
+            except (ImportError, OSError, ValueError):
+                cached = None
+    if cached is None:
+        logic_col, _ = logic_columns(use_kpi)
+        columns = None if all_columns else set(required_columns(LOGIC_COLS[0])) | set(LOGIC_COLS)
+        with _stage(stats, 'ingest') as counts:
+            cached = _prepare_alerts(read_alerts(file_path, columns), required_columns(logic_col))
+            cached['createdOn'] = parse_created_on(cached['createdOn'], date_format)
+            counts['rows_out'] = len(cached)
+        with _stage(stats, 'normalize', len(cached)) as counts:
+            for col in LOGIC_COLS:
+                if col in cached.columns:
+                    cached[f"{col}_clean"] = normalize_titles(cached[col], rules, memo_path)
+            counts['rows_out'] = len(cached)
+        with _stage(stats, 'cache write'):
+            try:
+                cached.to_parquet(cache_path, index=False)
+            except (ImportError, OSError, ValueError, TypeError):
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+    _evict_cache(cache_dir, max_bytes, keep=cache_path)
+
+    with _stage(stats, 'classify', len(cached)) as counts:
+        df = classify_alerts(_cached_view(cached, use_kpi, all_columns), calendar)
+        counts['rows_out'] = len(df)
+    return df
+
+# ---------------------------
+# PIPELINE: AGGREGATE
+# ---------------------------
+CUBE_DIMS = ['ipAddress','applicationName','category','Business','ETA_Breach','date']
+
+
+def cube_dims(use_kpi=False):
+    """Grain of the base aggregate: one row per distinct alert per day."""
+    _, clean_col = logic_columns(use_kpi)
+    return CUBE_DIMS[:3] + [clean_col] + CUBE_DIMS[3:]
+
+
+def build_cube(df, use_kpi=False, row_offset=0):
+    """Aggregate normalized alerts to the finest grain in a single pass.
+
+    Each cube row holds the alert count, the first raw Title / KPI seen and
+    the input row number of that example (first_row), so coarser tables can
+    pick the same example_value a groupby over the raw rows would.
+    Missing keys are kept here; the derived tables drop them as before.
+    """
+    logic_col, _ = logic_columns(use_kpi)
+    keys = df[cube_dims(use_kpi)[:-1]].assign(date=df['createdOn'].dt.normalize())
+    keys['example_value'] = df[logic_col]
+    keys['first_row'] = np.arange(row_offset, row_offset + len(df))
+    return (
+        keys.groupby(cube_dims(use_kpi), observed=True, dropna=False, sort=False)
+        .agg(count=('first_row','size'), example_value=('example_value','first'), first_row=('first_row','min'))
+        .reset_index()
+    )
+
+
+def _issue_table(cube, keys):
+    return (
+        cube.groupby(keys, observed=True)
+        .agg(repeat_count=('count','sum'), example_value=('example_value','first'))
+        .reset_index()
+    )
+
+
+def summarize_cube(cube, use_kpi=False, cluster=None):
+    """Build every summary table used by the workbook and the deck from the cube.
+
+    cluster (a similarity threshold) first merges near-duplicate clean keys,
+    see cluster_cube(); the raw ETA_Alert rows keep their own clean key.
+    """
+    _, clean_col = logic_columns(use_kpi)
+    if cluster is not None:
+        cube = cluster_cube(cube, use_kpi, cluster)
+    # earliest example first, so 'first' below matches a raw-row groupby
+    cube = cube.sort_values('first_row', kind='stable')
+
+    # Issue aggregation
+    issue_counts = _issue_table(cube, ['ipAddress','applicationName','category',clean_col])
+    all_issues = issue_counts[['ipAddress','applicationName','category','example_value','repeat_count',clean_col]].sort_values('repeat_count',ascending=False)
+    all_issues_business = _issue_table(cube, ['ipAddress','applicationName','category',clean_col,'Business'])\
+                            .sort_values('repeat_count',ascending=False)
+
+    # Category summaries
+    category_summary = issue_counts.groupby('category',observed=True).agg(total_issues=('repeat_count','sum'),unique_alerts=(clean_col,'nunique')).reset_index().sort_values('total_issues',ascending=False)
+    category_business = cube.groupby(['category','Business'],observed=True)['count'].sum().unstack(fill_value=0).reindex(columns=['Business','Non-Business'],fill_value=0).reset_index()
+    eta_summary = cube.groupby('ETA_Breach',observed=True)['count'].sum().reindex(['Yes','No'],fill_value=0).reset_index(name='count')
+    eta_business = cube.groupby(['ETA_Breach','Business'],observed=True)['count'].sum().unstack(fill_value=0).reindex(columns=['Business','Non-Business'],fill_value=0).reset_index()
+    daily_eta = cube[cube['ETA_Breach']=='Yes'].groupby('date')['count'].sum().reset_index(name='Breached_Count')
+    daily_eta = daily_eta.rename(columns={'date':'createdOn'})
+    daily_eta['createdOn'] = daily_eta['createdOn'].dt.strftime('%Y-%m-%d')
+
+    # Per-application tables shared by the App_ sheets and the app slides
+    app_issues = dict(tuple(all_issues.groupby('applicationName',observed=True)))
+    app_business = cube.groupby(['applicationName','Business'],observed=True)['count'].sum().unstack(fill_value=0).reindex(columns=['Business','Non-Business'],fill_value=0)
+
+    return {
+        'cube': cube,
+        'issue_counts': issue_counts,
+        'all_issues': all_issues,
+        'all_issues_business': all_issues_business,
+        'category_summary': category_summary,
+        'category_business': category_business,
+        'eta_summary': eta_summary,
+        'eta_business': eta_business,
+        'daily_eta': daily_eta,
+        'app_issues': app_issues,
+        'app_business': app_business,
+    }
+
+
+def aggregate_alerts(df, use_kpi=False, cluster=None):
+    """Cube the normalized alerts once and derive every summary table from it."""
+    return summarize_cube(build_cube(df, use_kpi), use_kpi, cluster)
+
+
+def app_tables(app_issues, app_business, apps=None):
+    """Yield (app, issue rows, Business / Non-Business counts) per application.
+
+    Both come from the tables summarize_cube() built once; nothing here may
+    filter the cube or the raw rows per application (guarded by
+    Alert_ETA_Benchmark.py --check-app-scaling).
+    """
+    for app in (app_issues if apps is None else apps):
+        yield app, app_issues[app], app_business.loc[app]
+
+
+def merge_cubes(cubes, use_kpi=False):
+    """Combine partial cubes (chunks, files, days) into one at the same grain."""
+    cubes = [c for c in cubes if len(c)]
+    if not cubes:
+        return build_cube(pd.DataFrame(columns=cube_dims(use_kpi)[:-1] + ['createdOn', logic_columns(use_kpi)[0]])
+                          .astype({'createdOn': 'datetime64[ns]'}), use_kpi)
+    if len(cubes) == 1:
+        return cubes[0]
+    return _collapse_cube(pd.concat(cubes, ignore_index=True), use_kpi)
+
+
+def _collapse_cube(cube, use_kpi=False):
+    """Re-aggregate cube rows that share the same grain."""
+    merged = (
+        cube.sort_values('first_row', kind='stable')
+        .groupby(cube_dims(use_kpi), observed=True, dropna=False, sort=False)
+        .agg(count=('count','sum'), example_value=('example_value','first'), first_row=('first_row','min'))
+        .reset_index()
+    )
+    for col in cube_dims(use_kpi)[:-1]:
+        merged[col] = _as_category(merged[col])
+    return merged
+
+
+def aggregate_stream(file_path, output_detail, use_kpi=False, chunk_rows=CHUNK_ROWS,
+                     rules=DEFAULT_NORMALIZE_RULES, memo_path=None, all_columns=False, stats=None, cluster=None,
+                     calendar=None):
+    """Chunked load -> normalize -> cube, merging the cube as chunks arrive.
+
+    Memory is bounded by the chunk size plus the cube. Each normalized chunk
+    is handed to output_detail(chunk) (e.g. a spill for the ETA_Alert sheet)
+    and then dropped. Returns the summary tables and the number of rows read.
+    """
+    logic_col, _ = logic_columns(use_kpi)
+    required = required_columns(logic_col)
+    signature = compile_normalize_rules(rules)[0].pattern
+    memo = _load_normalize_memo(memo_path, signature)
+
+    cube = None
+    rows = 0
+    chunks = iter_alert_chunks(file_path, None if all_columns else set(required), chunk_rows)
+    for chunk in (stats.iter_stage('ingest', chunks) if stats is not None else chunks):
+        _prepare_alerts(chunk, required)
+        normalize_alerts(chunk, use_kpi, rules, memo=memo, stats=stats, calendar=calendar)
+        with _stage(stats, 'aggregate', len(chunk)):
+            part = build_cube(chunk, use_kpi, row_offset=rows)
+            cube = part if cube is None else merge_cubes([cube, part], use_kpi)
+        rows += len(chunk)
+        with _stage(stats, 'spill', len(chunk)):
+            output_detail(chunk)
+
+    if memo_path:
+        _save_normalize_memo(memo_path, signature, memo)
+    with _stage(stats, 'aggregate') as counts:
+        aggs = summarize_cube(merge_cubes([cube] if cube is not None else [], use_kpi), use_kpi, cluster)
+        counts['rows_out'] = len(aggs['cube'])
+    return aggs, rows
+
+# ---------------------------
+# PIPELINE: AGGREGATE STORE
+# ---------------------------
+# SQLite store of cube rows for daily delta runs. Rows are kept per
+# grouping (Title/KPI column + normalize rules + calendar), stored once in
+# meta and referenced by its integer id, and per date; an alert is only
+# counted once, keyed by its id column or by (ipAddress, createdOn,
+# Title/KPI). first_row grows across ingests, so the stored example_value
+# is the earliest alert seen for each issue. With retain_days, seen keys
+# and cube rows older than the newest stored day minus N days are dropped.
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY, grouping TEXT NOT NULL UNIQUE, next_row INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS seen (gid INTEGER NOT NULL, key INTEGER NOT NULL, date TEXT, PRIMARY KEY (gid, key)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cube (
+    gid INTEGER NOT NULL, ipAddress, applicationName, category, clean, Business, ETA_Breach, date TEXT,
+    count INTEGER NOT NULL, example_value, first_row INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cube_gid_date ON cube (gid, date);
+"""
+STORE_COLS = ['ipAddress','applicationName','category','clean','Business','ETA_Breach','date','count','example_value','first_row']
+# Stores written before grouping ids keyed every seen/cube row on the full
+# grouping string; their seen keys carry no date and are never pruned.
+STORE_MIGRATE_V1 = f"""
+DROP INDEX IF EXISTS cube_grouping_date;
+ALTER TABLE meta RENAME TO meta_v1;
+ALTER TABLE seen RENAME TO seen_v1;
+ALTER TABLE cube RENAME TO cube_v1;
+{STORE_SCHEMA}
+INSERT INTO meta (grouping, next_row) SELECT grouping, next_row FROM meta_v1;
+INSERT INTO seen SELECT m.id, s.key, NULL FROM seen_v1 s JOIN meta m USING (grouping);
+INSERT INTO cube SELECT m.id, {', '.join('c.' + c for c in STORE_COLS)} FROM cube_v1 c JOIN meta m USING (grouping);
+DROP TABLE meta_v1;
+DROP TABLE seen_v1;
+DROP TABLE cube_v1;
+"""
+
+
+def _open_store(store_path):
+    import sqlite3
+
+    con = sqlite3.connect(store_path)
+    if 'grouping' in [col for _, col, *_ in con.execute('PRAGMA table_info(cube)')]:
+        con.executescript(f"BEGIN;{STORE_MIGRATE_V1}COMMIT;")
+    con.executescript(STORE_SCHEMA)
+    return con
+
+
+def _store_grouping(use_kpi, rules, calendar=None):
+    logic_col, _ = logic_columns(use_kpi)
+    grouping = f"{logic_col}|{compile_normalize_rules(rules)[0].pattern}"
+    return grouping if calendar is None else f"{grouping}|calendar={calendar.signature}"
+
+
+def _alert_keys(df, logic_col, id_col=None):
+    """Vectorized 64-bit key per alert (stable across runs)."""
+    cols = [id_col] if id_col else ['ipAddress','createdOn',logic_col]
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy().view(np.int64)
+
+
+def _seen_mask(con, gid, keys):
+    con.execute('CREATE TEMP TABLE IF NOT EXISTS batch_keys (key INTEGER PRIMARY KEY)')
+    con.execute('DELETE FROM batch_keys')
+    con.executemany('INSERT OR IGNORE INTO batch_keys VALUES (?)', ((int(k),) for k in keys))
+    seen = [k for (k,) in con.execute(
+        'SELECT b.key FROM batch_keys b JOIN seen s ON s.gid = ? AND s.key = b.key', (gid,))]
+    return np.isin(keys, np.array(seen, dtype=np.int64))
+
+
+def _retention_cutoff(con, gid, retain_days):
+    """First day (YYYY-MM-DD) kept: the newest stored day minus retain_days - 1."""
+    newest = con.execute('SELECT MAX(date) FROM cube WHERE gid = ?', (gid,)).fetchone()[0]
+    if not retain_days or newest is None:
+        return None
+    return (pd.Timestamp(newest) - pd.Timedelta(days=retain_days - 1)).strftime('%Y-%m-%d')
+
+
+def _store_to_cube(rows, use_kpi=False):
+    _, clean_col = logic_columns(use_kpi)
+    cube = rows[STORE_COLS].rename(columns={'clean': clean_col})
+    cube['date'] = pd.to_datetime(cube['date'])
+    for col in cube_dims(use_kpi)[:-1]:
+        cube[col] = _as_category(cube[col])
+    return cube
+
+
+def _cube_to_store(cube, gid, use_kpi=False):
+    _, clean_col = logic_columns(use_kpi)
+    rows = cube.rename(columns={clean_col: 'clean'})[STORE_COLS].copy()
+    rows['date'] = rows['date'].dt.strftime('%Y-%m-%d')
+    rows = rows.astype(object).where(rows.notna(), None)
+    rows.insert(0, 'gid', gid)
+    return rows.itertuples(index=False, name=None)
+
+
+def _merge_into_store(con, gid, part, use_kpi=False):
+    """Fold a chunk cube into the stored rows for the dates it touches."""
+    dates = part['date'].dropna()
+    where, params = [], [gid]
+    if len(dates):
+        where.append('date BETWEEN ? AND ?')
+        params += [dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')]
+    if part['date'].isna().any():
+        where.append('date IS NULL')
+    clause = f"gid = ? AND ({' OR '.join(where)})"
+    existing = pd.read_sql_query(f'SELECT * FROM cube WHERE {clause}', con, params=params)
+    merged = merge_cubes([_store_to_cube(existing, use_kpi), part], use_kpi)
+    con.execute(f'DELETE FROM cube WHERE {clause}', params)
+    con.executemany(f"INSERT INTO cube VALUES ({', '.join('?' * (len(STORE_COLS) + 1))})",
+                    _cube_to_store(merged, gid, use_kpi))
 
-        # ETA Logic
-        df['ackMetStatus'] = df['ackMetStatus'].astype(str).str.upper().str.strip()
-        df['ETA_Breach'] = df['ackMetStatus'].map({'Y':'No','N':'Yes','X':'Yes'}).fillna('Yes')
-        df['createdOn'] = pd.to_datetime(df['createdOn'])
-        df['hour'] = df['createdOn'].dt.hour
-        df['environment'] = df['environment'].astype(str).str.upper()
-        df['latestUpdCategory'] = df['latestUpdCategory'].astype(str).str.upper()
-
-        business_hour = (df['hour'] >=7) & (df['hour'] <23)
-        exclude_env = df['environment'].str.contains('DR|REPLICA', regex=True)
-        exclude_cr = df['latestUpdCategory'].str.contains('SUPPRESSED BY CR', regex=True)
-
-        df['Business'] = 'Non-Business'
-        df.loc[business_hour & ~exclude_env & ~exclude_cr, 'Business'] = 'Business'
-        df.drop(columns=['hour'], inplace=True)
-
-        # Issue aggregation
-        issue_counts = (
-            df.groupby(['ipAddress','applicationName','category',clean_col])
-            .agg(repeat_count=(clean_col,'size'), example_value=(logic_col,'first'))
-            .reset_index()
+
+def update_store(store_path, file_path, use_kpi=False, rules=DEFAULT_NORMALIZE_RULES, memo_path=None,
+                 id_col=None, chunk_rows=CHUNK_ROWS, calendar=None, retain_days=None):
+    """Add the alerts of one export that the store has not seen yet.
+
+    The export is read in chunks; each chunk is committed on its own, so an
+    interrupted ingest can simply be re-run. With retain_days, alerts older
+    than the retention window are skipped and expired seen keys and cube
+    rows are deleted after the ingest. Returns (added, skipped).
+    """
+    if retain_days is not None and retain_days < 1:
+        raise ValueError(f"retain_days must be at least 1, got {retain_days}")
+    logic_col, _ = logic_columns(use_kpi)
+    required = required_columns(logic_col)
+    grouping = _store_grouping(use_kpi, rules, calendar)
+    signature = compile_normalize_rules(rules)[0].pattern
+    memo = _load_normalize_memo(memo_path, signature)
+    columns = set(required) | ({id_col} if id_col else set())
+
+    con = _open_store(store_path)
+    added = skipped = 0
+    try:
+        row = con.execute('SELECT id, next_row FROM meta WHERE grouping = ?', (grouping,)).fetchone()
+        if row is None:
+            row = (con.execute('INSERT INTO meta (grouping, next_row) VALUES (?, 0)', (grouping,)).lastrowid, 0)
+        gid, next_row = row
+        cutoff = _retention_cutoff(con, gid, retain_days)
+        for chunk in iter_alert_chunks(file_path, columns, chunk_rows):
+            _prepare_alerts(chunk, required + ([id_col] if id_col else []))
+            chunk['createdOn'] = parse_created_on(chunk['createdOn'], calendar.date_format if calendar else None)
+            keys = _alert_keys(chunk, logic_col, id_col)
+            fresh = ~pd.Series(keys).duplicated().to_numpy() & ~_seen_mask(con, gid, keys)
+            if cutoff:
+                fresh &= ~(chunk['createdOn'] < pd.Timestamp(cutoff)).to_numpy()
+            skipped += int((~fresh).sum())
+            if not fresh.any():
+                continue
+            chunk = chunk[fresh].reset_index(drop=True)
+            normalize_alerts(chunk, use_kpi, rules, memo=memo, calendar=calendar)
+            part = build_cube(chunk, use_kpi, row_offset=next_row)
+            next_row += len(chunk)
+            added += len(chunk)
+            days = chunk['createdOn'].dt.strftime('%Y-%m-%d').astype(object).where(chunk['createdOn'].notna(), None)
+            con.executemany('INSERT INTO seen VALUES (?, ?, ?)', zip([gid] * len(chunk), keys[fresh].tolist(), days))
+            _merge_into_store(con, gid, part, use_kpi)
+            con.execute('UPDATE meta SET next_row = ? WHERE id = ?', (next_row, gid))
+            con.commit()
+        cutoff = _retention_cutoff(con, gid, retain_days)
+        if cutoff:
+            con.execute('DELETE FROM seen WHERE gid = ? AND date < ?', (gid, cutoff))
+            con.execute('DELETE FROM cube WHERE gid = ? AND date < ?', (gid, cutoff))
+            con.commit()
+    finally:
+        con.close()
+    if memo_path:
+        _save_normalize_memo(memo_path, signature, memo)
+    return added, skipped
+
+
+def load_store_cube(store_path, use_kpi=False, rules=DEFAULT_NORMALIZE_RULES, start=None, end=None, calendar=None):
+    """Stored cube rows for one grouping, optionally limited to [start, end] (YYYY-MM-DD)."""
+    if not os.path.exists(store_path):
+        raise ValueError(f"No aggregate store at {store_path}")
+    sql = 'SELECT cube.* FROM cube JOIN meta ON meta.id = cube.gid WHERE meta.grouping = ?'
+    params = [_store_grouping(use_kpi, rules, calendar)]
+    if start:
+        sql += ' AND date >= ?'
+        params.append(start)
+    if end:
+        sql += ' AND date <= ?'
+        params.append(end)
+    con = _open_store(store_path)
+    try:
+        rows = pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+    return _store_to_cube(rows, use_kpi)
+
+# ---------------------------
+# RENDER: EXCEL
+# ---------------------------
+EXCEL_MAX_ROWS = 1048576
+SHEET_PIECE_ROWS = 5000  # large tables are written in pieces so Cancel is not kept waiting
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+SIDECAR_FORMATS = ('parquet', 'csv')
+
+def write_excel(output_path, aggs, df, fast=False, raw_sidecar=None, stats=None):
+    """Write the workbook. df is the raw frame, an iterable of its chunks, or
+    None to leave out the ETA_Alert sheet.
+
+    fast uses xlsxwriter's constant_memory mode (row streaming, flat memory).
+    raw_sidecar ('parquet' or 'csv') moves the raw rows out of the workbook.
+    stats (RunStats) times the summary sheets, the raw rows, the App_ sheets
+    and the save, and is written as the last sheet, Run_Stats (the save
+    itself is only in the JSON log).
+    """
+    import xlsxwriter  # noqa: F401  (engine for pd.ExcelWriter)
+
+    issue_counts = aggs['issue_counts']
+    all_issues = aggs['all_issues']
+    all_issues_business = aggs['all_issues_business']
+    category_summary = aggs['category_summary']
+    category_business = aggs['category_business']
+    eta_summary = aggs['eta_summary']
+    eta_business = aggs['eta_business']
+    daily_eta = aggs['daily_eta']
+    app_issues = aggs['app_issues']
+    app_business = aggs['app_business']
+    mark = stats.start if stats is not None else lambda name, rows_in=None: None
+    check_cancelled = stats.check_cancelled if stats is not None else lambda: None
+
+    mark('excel summary', len(all_issues))
+    options = {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd hh:mm:ss'} if fast else {}
+    with _excel_writer(output_path, options) as writer:
+        workbook = writer.book
+        # ====== ALL Excel Sheets & Charts Logic (same as mother code) ======
+        # All_Alert
+        _write_split(writer,_iter_frames(all_issues,stats,SHEET_PIECE_ROWS),'All_Alert')
+        # All_Alert_Business (Business counts and chart go on its last part)
+        biz_sheet, biz_end = _write_split(writer,_iter_frames(all_issues_business,stats,SHEET_PIECE_ROWS),'All_Alert_Business',reserve=5)
+        all_alert_ws = writer.sheets[biz_sheet]
+        biz_count = all_issues_business.groupby('Business',observed=True)['repeat_count'].sum().reindex(['Business','Non-Business'],fill_value=0).reset_index()
+        start_biz_chart = biz_end+2
+        _to_sheet(writer,biz_count,biz_sheet,startrow=start_biz_chart)
+        all_alert_chart = workbook.add_chart({'type':'column'})
+        all_alert_chart.add_series({
+            'name':'Business vs Non-Business',
+            'categories':[biz_sheet,start_biz_chart+1,0,start_biz_chart+2,0],
+            'values':[biz_sheet,start_biz_chart+1,1,start_biz_chart+2,1],
+            'points':[{'fill':{'color':'red'}},{'fill':{'color':'green'}}],
+            'data_labels':{'value':True}
+        })
+        style_chart(all_alert_chart,'All Alerts – Business vs Non-Business')
+        all_alert_ws.insert_chart('H2',all_alert_chart)
+
+        # Category_Summary
+        _to_sheet(writer,category_summary,'Category_Summary')
+        cat_ws = writer.sheets['Category_Summary']
+        cat_chart = workbook.add_chart({'type':'column'})
+        cat_chart.add_series({
+            'name':'Total Alerts',
+            'categories':['Category_Summary',1,0,len(category_summary),0],
+            'values':['Category_Summary',1,1,len(category_summary),1],
+            'data_labels':{'value':True}
+        })
+        style_chart(cat_chart,'Total Alerts per Category')
+        cat_ws.insert_chart('E2',cat_chart)
+        start = len(category_summary)+4
+        _to_sheet(writer,category_business,'Category_Summary',startrow=start)
+        cat_biz = workbook.add_chart({'type':'column'})
+        cat_biz.add_series({
+            'name':'Business',
+            'categories':['Category_Summary',start+1,0,start+len(category_business),0],
+            'values':['Category_Summary',start+1,1,start+len(category_business),1],
+            'fill':{'color':'red'},
+            'data_labels':{'value':True}
+        })
+        cat_biz.add_series({
+            'name':'Non-Business',
+            'categories':['Category_Summary',start+1,0,start+len(category_business),0],
+            'values':['Category_Summary',start+1,2,start+len(category_business),2],
+            'fill':{'color':'green'},
+            'data_labels':{'value':True}
+        })
+        style_chart(cat_biz,'Business vs Non-Business by Category')
+        cat_ws.insert_chart('E20',cat_biz)
+
+        # =========================
+        # NEW SHEET: Application vs Category Matrix
+        # =========================
+        app_category_matrix = (
+        issue_counts
+        .pivot_table(
+        index='applicationName',
+        columns='category',
+        values='repeat_count',
+        aggfunc='sum',
+        fill_value=0)
         )
-        all_issues = issue_counts[['ipAddress','applicationName','category','example_value','repeat_count',clean_col]].sort_values('repeat_count',ascending=False)
-
-        # Category summaries
-        category_summary = issue_counts.groupby('category').agg(total_issues=('repeat_count','sum'),unique_alerts=(clean_col,'nunique')).reset_index().sort_values('total_issues',ascending=False)
-        category_business = df.groupby(['category','Business']).size().unstack(fill_value=0).reindex(columns=['Business','Non-Business'],fill_value=0).reset_index()
-        eta_summary = df.groupby('ETA_Breach').size().reindex(['Yes','No'],fill_value=0).reset_index(name='count')
-        eta_business = df.groupby(['ETA_Breach','Business']).size().unstack(fill_value=0).reindex(columns=['Business','Non-Business'],fill_value=0).reset_index()
-        daily_eta = df[df['ETA_Breach']=='Yes'].groupby(df['createdOn'].dt.date).size().reset_index(name='Breached_Count')
-        daily_eta['createdOn'] = daily_eta['createdOn'].astype(str)
-
-        output_path = filedialog.asksaveasfilename(defaultextension=".xlsx",filetypes=[("Excel files","*.xlsx *.xls")])
-        if not output_path:
-            return
 
-        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-            workbook = writer.book
-            # ====== ALL Excel Sheets & Charts Logic (same as mother code) ======
-            # All_Alert
-            all_issues.to_excel(writer,index=False,sheet_name='All_Alert')
-            # All_Alert_Business
-            all_issues_business = df.groupby(['ipAddress','applicationName','category',clean_col,'Business'])\
-                                    .agg(repeat_count=(clean_col,'size'),example_value=(logic_col,'first'))\
-                                    .reset_index().sort_values('repeat_count',ascending=False)
-            all_issues_business.to_excel(writer,index=False,sheet_name='All_Alert_Business')
-            all_alert_ws = writer.sheets['All_Alert_Business']
-            biz_count = all_issues_business.groupby('Business')['repeat_count'].sum().reindex(['Business','Non-Business'],fill_value=0).reset_index()
-            start_biz_chart = len(all_issues_business)+3
-            biz_count.to_excel(writer,sheet_name='All_Alert_Business',startrow=start_biz_chart,index=False)
-            all_alert_chart = workbook.add_chart({'type':'column'})
-            all_alert_chart.add_series({
+        # Add Grand Total column
+        app_category_matrix['Grand Total'] = app_category_matrix.sum(axis=1)
+
+        # Add Grand Total row
+        grand_total_row = pd.DataFrame(
+        app_category_matrix.sum(axis=0)
+        ).T
+        grand_total_row.index = ['Grand Total']
+
+        app_category_matrix = pd.concat([app_category_matrix, grand_total_row])
+
+            # Reset index for Excel
+        app_category_matrix.reset_index(inplace=True)
+        app_category_matrix.rename(columns={'applicationName': 'Application Name'}, inplace=True)
+        app_category_matrix.rename(columns={'index': 'Application Name'}, inplace=True)
+
+        _to_sheet(
+            writer,
+            app_category_matrix,
+            'Application_Category_Matrix'
+             )
+
+
+        # ETA_Ack_Breach
+        _to_sheet(writer,eta_summary,'ETA_Ack_Breach')
+        eta_ws = writer.sheets['ETA_Ack_Breach']
+        eta_chart = workbook.add_chart({'type':'column'})
+        eta_chart.add_series({
+            'name':'ETA Status',
+            'categories':['ETA_Ack_Breach',1,0,2,0],
+            'values':['ETA_Ack_Breach',1,1,2,1],
+            'points':[{'fill':{'color':'red'}},{'fill':{'color':'green'}}],
+            'data_labels':{'value':True}
+        })
+        style_chart(eta_chart,'ACK-ETA Breach Status')
+        eta_ws.insert_chart('D2',eta_chart)
+        start_eta = len(eta_summary)+4
+        _to_sheet(writer,eta_business,'ETA_Ack_Breach',startrow=start_eta)
+        eta_yes_row = eta_business[eta_business['ETA_Breach']=='Yes'].index[0]
+        excel_row = start_eta + 1 + eta_yes_row
+        eta_biz = workbook.add_chart({'type':'column'})
+        eta_biz.add_series({
+            'name':'Business',
+            'categories':['ETA_Ack_Breach',excel_row,0,excel_row,0],
+            'values':['ETA_Ack_Breach',excel_row,1,excel_row,1],
+            'fill':{'color':'red'},
+            'data_labels':{'value':True}
+        })
+        eta_biz.add_series({
+            'name':'Non-Business',
+            'categories':['ETA_Ack_Breach',excel_row,0,excel_row,0],
+            'values':['ETA_Ack_Breach',excel_row,2,excel_row,2],
+            'fill':{'color':'green'},
+            'data_labels':{'value':True}
+        })
+        style_chart(eta_biz,'ACK-ETA Breach – Business vs Non-Business')
+        eta_ws.insert_chart('D20',eta_biz)
+        trend_start = start_eta + len(eta_business)+6
+        _to_sheet(writer,daily_eta,'ETA_Ack_Breach',startrow=trend_start)
+        trend_chart = workbook.add_chart({'type':'line'})
+        trend_chart.add_series({
+            'name':'Daily ACK-ETA Breach Trend',
+            'categories':['ETA_Ack_Breach',trend_start+1,0,trend_start+len(daily_eta),0],
+            'values':['ETA_Ack_Breach',trend_start+1,1,trend_start+len(daily_eta),1],
+            'data_labels':{'value':True},
+            'marker':{'type':'circle'}
+        })
+        trend_chart.set_x_axis({'text_axis':True,'label_position':'low'})
+        style_chart(trend_chart,'Daily ACK-ETA Breach Trend')
+        eta_ws.insert_chart('K2',trend_chart)
+
+        # ETA_Alert (or a Parquet/CSV sidecar next to the workbook)
+        mark('excel raw rows', len(df) if isinstance(df, pd.DataFrame) else None)
+        if df is None:
+            pass  # report built from stored aggregates: no raw rows
+        elif raw_sidecar:
+            _write_sidecar(sidecar_path_for(output_path, raw_sidecar), _iter_frames(df, stats))
+        else:
+            _write_split(writer, _iter_frames(df, stats, SHEET_PIECE_ROWS), 'ETA_Alert')
+
+        # Application Sheets
+        mark('excel app sheets', len(all_issues))
+        for app, app_df, biz in app_tables(app_issues, app_business):
+            check_cancelled()
+            sheet = f"App_{app}"[:31]
+            _to_sheet(writer,app_df,sheet)
+            ws = writer.sheets[sheet]
+            top10 = app_df.head(10)
+            if not top10.empty:
+                top_chart = workbook.add_chart({'type':'bar'})
+                top_chart.add_series({
+                    'name':'Repeat Count',
+                    'categories':[sheet,1,3,len(top10),3],
+                    'values':[sheet,1,4,len(top10),4],
+                    'data_labels':{'value':True}
+                })
+                style_chart(top_chart,f'Top 10 Alerts – {app}')
+                ws.insert_chart('H2',top_chart)
+            biz = biz.rename_axis('Business').reset_index(name='count')
+            start_app = len(app_df)+4
+            _to_sheet(writer,biz,sheet,startrow=start_app)
+            app_chart = workbook.add_chart({'type':'column'})
+            app_chart.add_series({
                 'name':'Business vs Non-Business',
-                'categories':['All_Alert_Business',start_biz_chart+1,0,start_biz_chart+2,0],
-                'values':['All_Alert_Business',start_biz_chart+1,1,start_biz_chart+2,1],
+                'categories':[sheet,start_app+1,0,start_app+2,0],
+                'values':[sheet,start_app+1,1,start_app+2,1],
                 'points':[{'fill':{'color':'red'}},{'fill':{'color':'green'}}],
                 'data_labels':{'value':True}
             })
-            style_chart(all_alert_chart,'All Alerts – Business vs Non-Business')
-            all_alert_ws.insert_chart('H2',all_alert_chart)
-
-            # Category_Summary
-            category_summary.to_excel(writer,index=False,sheet_name='Category_Summary')
-            cat_ws = writer.sheets['Category_Summary']
-            cat_chart = workbook.add_chart({'type':'column'})
-            cat_chart.add_series({
-                'name':'Total Alerts',
-                'categories':['Category_Summary',1,0,len(category_summary),0],
-                'values':['Category_Summary',1,1,len(category_summary),1],
-                'data_labels':{'value':True}
-            })
-            style_chart(cat_chart,'Total Alerts per Category')
-            cat_ws.insert_chart('E2',cat_chart)
-            start = len(category_summary)+4
-            category_business.to_excel(writer,sheet_name='Category_Summary',startrow=start,index=False)
-            cat_biz = workbook.add_chart({'type':'column'})
-            cat_biz.add_series({
-                'name':'Business',
-                'categories':['Category_Summary',start+1,0,start+len(category_business),0],
-                'values':['Category_Summary',start+1,1,start+len(category_business),1],
-                'fill':{'color':'red'},
-                'data_labels':{'value':True}
-            })
-            cat_biz.add_series({
-                'name':'Non-Business',
-                'categories':['Category_Summary',start+1,0,start+len(category_business),0],
-                'values':['Category_Summary',start+1,2,start+len(category_business),2],
-                'fill':{'color':'green'},
-                'data_labels':{'value':True}
-            })
-            style_chart(cat_biz,'Business vs Non-Business by Category')
-            cat_ws.insert_chart('E20',cat_biz)
-
-            # =========================
-            # NEW SHEET: Application vs Category Matrix
-            # =========================
-            app_category_matrix = (
-            issue_counts
-            .pivot_table(
-            index='applicationName',
-            columns='category',
-            values='repeat_count',
-            aggfunc='sum',
-            fill_value=0)
-            )
-
-            # Add Grand Total column
-            app_category_matrix['Grand Total'] = app_category_matrix.sum(axis=1)
-
-            # Add Grand Total row
-            grand_total_row = pd.DataFrame(
-            app_category_matrix.sum(axis=0)
-            ).T
-            grand_total_row.index = ['Grand Total']
-
-            app_category_matrix = pd.concat([app_category_matrix, grand_total_row])
-
-                # Reset index for Excel
-            app_category_matrix.reset_index(inplace=True)
-            app_category_matrix.rename(columns={'applicationName': 'Application Name'}, inplace=True)
-            app_category_matrix.rename(columns={'index': 'Application Name'}, inplace=True)
-                
-            app_category_matrix.to_excel(
-                writer,
-                sheet_name='Application_Category_Matrix',
-                index=False
-                 )
-               
-
-            # ETA_Ack_Breach
-            eta_summary.to_excel(writer,index=False,sheet_name='ETA_Ack_Breach')
-            eta_ws = writer.sheets['ETA_Ack_Breach']
-            eta_chart = workbook.add_chart({'type':'column'})
-            eta_chart.add_series({
-                'name':'ETA Status',
-                'categories':['ETA_Ack_Breach',1,0,2,0],
-                'values':['ETA_Ack_Breach',1,1,2,1],
-                'points':[{'fill':{'color':'red'}},{'fill':{'color':'green'}}],
-                'data_labels':{'value':True}
-            })
-            style_chart(eta_chart,'ACK-ETA Breach Status')
-            eta_ws.insert_chart('D2',eta_chart)
-            start_eta = len(eta_summary)+4
-            eta_business.to_excel(writer,sheet_name='ETA_Ack_Breach',startrow=start_eta,index=False)
-            eta_yes_row = eta_business[eta_business['ETA_Breach']=='Yes'].index[0]
-            excel_row = start_eta + 1 + eta_yes_row
-            eta_biz = workbook.add_chart({'type':'column'})
-            eta_biz.add_series({
-                'name':'Business',
-                'categories':['ETA_Ack_Breach',excel_row,0,excel_row,0],
-                'values':['ETA_Ack_Breach',excel_row,1,excel_row,1],
-                'fill':{'color':'red'},
-                'data_labels':{'value':True}
-            })
-            eta_biz.add_series({
-                'name':'Non-Business',
-                'categories':['ETA_Ack_Breach',excel_row,0,excel_row,0],
-                'values':['ETA_Ack_Breach',excel_row,2,excel_row,2],
-                'fill':{'color':'green'},
-                'data_labels':{'value':True}
-            })
-            style_chart(eta_biz,'ACK-ETA Breach – Business vs Non-Business')
-            eta_ws.insert_chart('D20',eta_biz)
-            trend_start = start_eta + len(eta_business)+6
-            daily_eta.to_excel(writer,sheet_name='ETA_Ack_Breach',startrow=trend_start,index=False)
-            trend_chart = workbook.add_chart({'type':'line'})
-            trend_chart.add_series({
-                'name':'Daily ACK-ETA Breach Trend',
-                'categories':['ETA_Ack_Breach',trend_start+1,0,trend_start+len(daily_eta),0],
-                'values':['ETA_Ack_Breach',trend_start+1,1,trend_start+len(daily_eta),1],
-                'data_labels':{'value':True},
-                'marker':{'type':'circle'}
-            })
-            trend_chart.set_x_axis({'text_axis':True,'label_position':'low'})
-            style_chart(trend_chart,'Daily ACK-ETA Breach Trend')
-            eta_ws.insert_chart('K2',trend_chart)
-
-            # ETA_Alert
-            df.to_excel(writer,index=False,sheet_name='ETA_Alert')
-            
-            # Application Sheets
-            for app, app_df in all_issues.groupby('applicationName'):
-                sheet = f"App_{app}"[:31]
-                app_df.to_excel(writer,index=False,sheet_name=sheet)
-                ws = writer.sheets[sheet]
-                top10 = app_df.head(10)
-                if not top10.empty:
-                    top_chart = workbook.add_chart({'type':'bar'})
-                    top_chart.add_series({
-                        'name':'Repeat Count',
-                        'categories':[sheet,1,3,len(top10),3],
-                        'values':[sheet,1,4,len(top10),4],
-                        'data_labels':{'value':True}
-                    })
-                    style_chart(top_chart,f'Top 10 Alerts – {app}')
-                    ws.insert_chart('H2',top_chart)
-                biz = df[df['applicationName']==app].groupby('Business').size().reindex(['Business','Non-Business'],fill_value=0).reset_index(name='count')
-                start_app = len(app_df)+4
-                biz.to_excel(writer,sheet_name=sheet,startrow=start_app,index=False)
-                app_chart = workbook.add_chart({'type':'column'})
-                app_chart.add_series({
-                    'name':'Business vs Non-Business',
-                    'categories':[sheet,start_app+1,0,start_app+2,0],
-                    'values':[sheet,start_app+1,1,start_app+2,1],
-                    'points':[{'fill':{'color':'red'}},{'fill':{'color':'green'}}],
-                    'data_labels':{'value':True}
-                })
-                style_chart(app_chart,f'Business vs Non-Business – {app}')
-                ws.insert_chart('H20',app_chart)
-                
-        # Generate PPT
-        ppt_path = output_path.replace('.xlsx','.pptx')
-        generate_ppt(ppt_path, category_summary, category_business, eta_business, daily_eta, all_issues, df)
-        messagebox.showinfo("Success",f"Report generated successfully.\nExcel: {output_path}\nPPT: {ppt_path}")
+            style_chart(app_chart,f'Business vs Non-Business – {app}')
+            ws.insert_chart('H20',app_chart)
+
+        if stats is not None:
+            stats.stop()
+            check_cancelled()  # frame() waits for the deck worker
+            _to_sheet(writer,stats.frame(),'Run_Stats')
+            stats.start('excel save')
+    if stats is not None:
+        stats.stop()
+
+@contextlib.contextmanager
+def _excel_writer(output_path, options):
+    """pd.ExcelWriter that is only saved when the body completes.
+
+    A failed or cancelled workbook is discarded anyway, so the (slow) save
+    is skipped and the file is left empty.
+    """
+    with open(output_path, 'wb') as fh:
+        writer = pd.ExcelWriter(fh, engine='xlsxwriter', engine_kwargs={'options': options})
+        yield writer
+        writer.close()
+
+
+def _to_sheet(writer, df, sheet_name, startrow=0, header=True):
+    """df.to_excel(index=False), or row-major write_row in constant_memory mode.
+
+    constant_memory flushes each row as soon as a later row is written, so
+    pandas' column-by-column cell order cannot be used there.
+    """
+    book = writer.book
+    if not book.constant_memory:
+        df.to_excel(writer,index=False,sheet_name=sheet_name,startrow=startrow,header=header)
+        return
+    ws = book.get_worksheet_by_name(sheet_name) or book.add_worksheet(sheet_name)
+    row = startrow
+    if header:
+        ws.write_row(row, 0, [str(c) for c in df.columns], book.add_format(HEADER_FORMAT))
+        row += 1
+    values = df.astype(object).where(df.notna(), None)
+    for record in values.itertuples(index=False, name=None):
+        ws.write_row(row, 0, record)
+        row += 1
+
+
+def _iter_frames(detail, stats=None, rows=CHUNK_ROWS):
+    """A frame, or its chunks, in pieces of at most `rows` rows; with stats,
+    a cancelled run stops between pieces."""
+    for chunk in ([detail] if isinstance(detail, pd.DataFrame) else detail):
+        for start in range(0, max(len(chunk), 1), rows):
+            if stats is not None:
+                stats.check_cancelled()
+            yield chunk.iloc[start:start + rows]
 
+
+def _write_split(writer, chunks, sheet_name, reserve=0):
+    """Write chunks as one table; past Excel's row limit continue on <sheet>_2, _3, ...
+
+    Returns (last sheet, its next free row) so content can follow the table;
+    reserve keeps that many rows free at the bottom of every part for it.
+    """
+    limit = EXCEL_MAX_ROWS - reserve
+    sheet, part, row, columns = sheet_name, 1, 0, None
+    for chunk in chunks:
+        columns = chunk.columns
+        start = 0
+        while start < len(chunk):
+            if row == limit:
+                part += 1
+                sheet, row = f"{sheet_name}_{part}", 0
+            piece = chunk.iloc[start:start + limit - max(row, 1)]
+            _to_sheet(writer, piece, sheet, startrow=row, header=(row == 0))
+            row += len(piece) + (row == 0)
+            start += len(piece)
+    if row == 0 and columns is not None:
+        _to_sheet(writer, pd.DataFrame(columns=columns), sheet)
+        row = 1
+    return sheet, row
+
+
+def sidecar_path_for(output_path, fmt):
+    return f"{os.path.splitext(output_path)[0]}_ETA_Alert.{fmt}"
+
+
+def _write_sidecar(path, chunks):
+    """Stream the raw rows to Parquet or CSV instead of the ETA_Alert sheet."""
+    if path.endswith('.csv'):
+        first = True
+        for chunk in chunks:
+            chunk.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+            first = False
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq_writer = None
+    try:
+        for chunk in chunks:
+            # chunk categoricals differ; store plain values so every batch shares one schema
+            cats = [c for c in chunk.columns if isinstance(chunk[c].dtype, pd.CategoricalDtype)]
+            chunk = chunk.astype({c: object for c in cats})
+            schema = None if pq_writer is None else pq_writer.schema
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if pq_writer is None:
+                pq_writer = pq.ParquetWriter(path, table.schema)
+            pq_writer.write_table(table)
+    finally:
+        if pq_writer is not None:
+            pq_writer.close()
+
+
+PPT_AGG_KEYS = ('category_summary', 'category_business', 'eta_business', 'daily_eta', 'app_issues', 'app_business')
+
+
+def render_ppt(ppt_path, aggs, ppt_options=None, stats=None):
+    if stats is not None:
+        stats.start('ppt slides', len(aggs['app_business']))
+    generate_ppt(ppt_path, *(aggs[k] for k in PPT_AGG_KEYS), **(ppt_options or {}), stats=stats)
+    if stats is not None:
+        stats.stop()
+
+
+def _render_ppt_measured(ppt_path, aggs, ppt_options=None, profile_path=None):
+    """render_ppt() in a worker process; returns (stage records, {stage: profile file}, error)."""
+    stats = RunStats(profile_path)
+    error = None
+    try:
+        render_ppt(ppt_path, aggs, ppt_options, stats)
+    except Exception as e:
+        error = str(e)
+    stats.finish()
+    return stats.records, {stats.slowest: stats.profile} if stats.profile else {}, error
+
+
+PPT_POLL_SECONDS = 0.2  # how often a wait for the deck worker checks for Cancel
+
+
+def _partial_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.partial{os.getpid()}{ext}"
+
+
+def render_outputs(output_path, ppt_path, aggs, detail, fast_excel=False, raw_sidecar=None, parallel=True,
+                   ppt_options=None, stats=None):
+    """Write the workbook and (if ppt_path) the deck, concurrently by default.
+
+    The deck is built in a worker process from the finished aggregates while
+    this process writes the workbook; the raw rows stay here so they are
+    never pickled. Failures from both sides are raised together.
+    The deck's stage timings (measured in the worker) are merged into stats
+    before the Run_Stats sheet is written; without a worker the deck is
+    built first for the same reason.
+    Each file is written under a .partial name and moved into place once
+    complete; a failed side, or a cancelled run, leaves nothing behind. A
+    cancelled run stops the deck worker instead of waiting for it.
+    """
+    stats = stats if stats is not None else RunStats()
+    errors = {}
+    pool = None
+    aborted = False
+    excel_tmp = _partial_path(output_path)
+    partial = {'Excel': [(excel_tmp, output_path)]}
+    if raw_sidecar:
+        partial['Excel'].append((sidecar_path_for(excel_tmp, raw_sidecar), sidecar_path_for(output_path, raw_sidecar)))
+    if ppt_path:
+        partial['PPT'] = [(_partial_path(ppt_path), ppt_path)]
+    try:
+        if ppt_path and parallel:
+            import multiprocessing
+
+            pool = multiprocessing.Pool(1)  # unlike an executor, terminate() stops a running task
+            worker_profile = '{}.ppt{}'.format(*os.path.splitext(stats.profile_path)) if stats.profile_path else None
+            ppt_result = pool.apply_async(_render_ppt_measured, (partial['PPT'][0][0], {k: aggs[k] for k in PPT_AGG_KEYS},
+                                                                 ppt_options, worker_profile))
+
+            def collect_ppt():
+                if aborted:
+                    return  # the worker was stopped; there is no deck to report
+                while True:
+                    try:
+                        records, profiles, error = ppt_result.get(timeout=PPT_POLL_SECONDS)
+                        stats.add(records, profiles)
+                    except multiprocessing.TimeoutError:
+                        stats.check_cancelled()  # RunCancelled: the worker is terminated below
+                        continue
+                    except Exception as e:
+                        error = str(e)
+                    break
+                if error:
+                    errors['PPT'] = error
+
+            stats.defer(collect_ppt)
+        elif ppt_path:
+            try:
+                render_ppt(partial['PPT'][0][0], aggs, ppt_options, stats)
+            except RunCancelled:
+                raise
+            except Exception as e:
+                errors['PPT'] = str(e)
+        try:
+            write_excel(excel_tmp, aggs, detail, fast_excel, raw_sidecar, stats)
+        except RunCancelled:
+            raise
+        except Exception as e:
+            errors['Excel'] = str(e)
+        stats.collect()
+    except BaseException:
+        errors = dict.fromkeys(partial)
+        aborted = True
+        raise
+    finally:
+        if pool is not None:
+            if aborted:
+                pool.terminate()  # the deck would be thrown away: stop building it
+            else:
+                pool.close()
+            pool.join()  # the deck worker must be done with its file before it is moved or removed
+        for side, paths in partial.items():
+            for tmp, final in paths:
+                if side in errors:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                elif os.path.exists(tmp):
+                    os.replace(tmp, final)
+    if errors:
+        raise RuntimeError("\n".join(f"{side}: {errors[side]}" for side in ('Excel', 'PPT') if side in errors))
+
+# ---------------------------
+# Main Logic
+# ---------------------------
+class DetailSpill:
+    """Normalized chunks parked on disk until the ETA_Alert sheet is written."""
+
+    def __init__(self, spill_dir, paths=None):
+        self.spill_dir = spill_dir
+        self.paths = list(paths or [])
+
+    def add(self, chunk):
+        path = os.path.join(self.spill_dir, f"chunk_{len(self.paths):05d}.pkl")
+        chunk.to_pickle(path)
+        self.paths.append(path)
+
+    def __iter__(self):
+        for path in self.paths:
+            yield pd.read_pickle(path)
+
+
+def ppt_path_for(output_path):
+    return os.path.splitext(output_path)[0] + '.pptx'
+
+
+def run_report(input_path, output_path, use_kpi=False, make_ppt=True,
+               norm_rules=DEFAULT_NORMALIZE_RULES, norm_memo=None, all_columns=False,
+               stream=False, chunk_rows=CHUNK_ROWS, cache_dir=None, cache_max_bytes=CACHE_MAX_BYTES,
+               fast_excel=None, raw_sidecar=None, parallel_render=True, ppt_options=None, stats=None,
+               cluster=None, calendar=None):
+    """Headless entry point: build the workbook (and deck) for one export.
+
+    With stream=True the export is read in chunks of chunk_rows and never
+    held in memory as a whole; the ETA_Alert rows are spilled to a temp dir.
+    With cache_dir, the parsed input is reused across runs (not in stream mode).
+    fast_excel / raw_sidecar are passed to write_excel(); fast_excel=None
+    means on with stream (the ETA_Alert rows would otherwise all sit in
+    xlsxwriter's memory until save) and off without. parallel_render
+    builds the deck in a worker process alongside the workbook; ppt_options
+    (template / top_n / grid) go to generate_ppt(). stats (RunStats) collects
+    the per-stage measurements; the workbook always gets a Run_Stats sheet.
+    cluster (a similarity threshold) merges near-duplicate clean keys;
+    calendar (BusinessCalendar) sets the Business split and createdOn parsing.
+    Returns (excel_path, ppt_path); ppt_path is None when make_ppt is False.
+    """
+    ppt_path = ppt_path_for(output_path) if make_ppt else None
+    stats = stats if stats is not None else RunStats()
+    if fast_excel is None:
+        fast_excel = stream
+    if stream:
+        with tempfile.TemporaryDirectory(prefix='ngo_alert_') as spill_dir:
+            spill = DetailSpill(spill_dir)
+            aggs, _ = aggregate_stream(input_path, spill.add, use_kpi, chunk_rows, norm_rules, norm_memo, all_columns,
+                                       stats, cluster, calendar)
+            render_outputs(output_path, ppt_path, aggs, spill, fast_excel, raw_sidecar, parallel_render,
+                           ppt_options, stats)
+    else:
+        if cache_dir:
+            df = load_cached(input_path, cache_dir, use_kpi, norm_rules, norm_memo, all_columns, cache_max_bytes,
+                             stats, calendar)
+        else:
+            with stats.stage('ingest') as counts:
+                df = load_alerts(input_path, use_kpi, all_columns)
+                counts['rows_out'] = len(df)
+            normalize_alerts(df, use_kpi, norm_rules, norm_memo, stats=stats, calendar=calendar)
+        with stats.stage('aggregate', len(df)) as counts:
+            aggs = aggregate_alerts(df, use_kpi, cluster)
+            counts['rows_out'] = len(aggs['cube'])
+        render_outputs(output_path, ppt_path, aggs, df, fast_excel, raw_sidecar, parallel_render, ppt_options, stats)
+    return output_path, ppt_path
+
+
+def report_from_store(store_path, output_path, use_kpi=False, make_ppt=True, norm_rules=DEFAULT_NORMALIZE_RULES,
+                      start=None, end=None, fast_excel=False, parallel_render=True, ppt_options=None, stats=None,
+                      cluster=None, calendar=None):
+    """Build the workbook (and deck) for a date range from the aggregate store.
+
+    The store has no raw rows, so the workbook has no ETA_Alert sheet.
+    """
+    stats = stats if stats is not None else RunStats()
+    with stats.stage('store read') as counts:
+        cube = load_store_cube(store_path, use_kpi, norm_rules, start, end, calendar)
+        counts['rows_out'] = len(cube)
+    with stats.stage('aggregate', len(cube)) as counts:
+        aggs = summarize_cube(cube, use_kpi, cluster)
+        counts['rows_out'] = len(aggs['issue_counts'])
+    ppt_path = ppt_path_for(output_path) if make_ppt else None
+    render_outputs(output_path, ppt_path, aggs, None, fast_excel, None, parallel_render, ppt_options, stats)
+    return output_path, ppt_path
+
+
+def resolve_batch_inputs(pattern):
+    """Export files in a directory (by extension) or matching a glob, sorted."""
+    if os.path.isdir(pattern):
+        exts = ('.xlsx', '.xls') + CSV_EXTS + PARQUET_EXTS
+        files = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                 if name.lower().endswith(exts) and not name.startswith('~$')]
+    else:
+        files = glob.glob(pattern)
+    if not files:
+        raise ValueError(f"No alert exports found for {pattern}")
+    return sorted(files)
+
+
+def _batch_worker(file_path, spill_path, use_kpi, norm_rules, norm_memo, all_columns, cache_dir, cache_max_bytes,
+                  per_file_output, make_ppt, fast_excel, ppt_options, cluster=None, calendar=None):
+    """Load, normalize and cube one export (runs in a pool worker)."""
+    try:
+        stats = RunStats()
+        if cache_dir:
+            df = load_cached(file_path, cache_dir, use_kpi, norm_rules, norm_memo, all_columns, cache_max_bytes,
+                             stats, calendar)
+        else:
+            with stats.stage('ingest') as counts:
+                df = load_alerts(file_path, use_kpi, all_columns)
+                counts['rows_out'] = len(df)
+            normalize_alerts(df, use_kpi, norm_rules, norm_memo, stats=stats, calendar=calendar)
+        with stats.stage('aggregate', len(df)) as counts:
+            cube = build_cube(df, use_kpi)
+            counts['rows_out'] = len(cube)
+        if per_file_output:
+            ppt_path = ppt_path_for(per_file_output) if make_ppt else None
+            render_outputs(per_file_output, ppt_path, summarize_cube(cube, use_kpi, cluster), df, fast_excel,
+                           parallel=False, ppt_options=ppt_options, stats=stats)
+        df.to_pickle(spill_path)
+        return cube, len(df)
     except Exception as e:
-        messagebox.showerror("Error", str(e))
+        raise ValueError(f"{os.path.basename(file_path)}: {e}") from e
+
+
+def run_batch(pattern, output_path, use_kpi=False, make_ppt=True, norm_rules=DEFAULT_NORMALIZE_RULES,
+              norm_memo=None, all_columns=False, cache_dir=None, cache_max_bytes=CACHE_MAX_BYTES,
+              fast_excel=None, raw_sidecar=None, parallel_render=True, per_file_dir=None, workers=None,
+              ppt_options=None, stats=None, cluster=None, calendar=None):
+    """Consolidated report over several exports (a directory or a glob).
+
+    Each file is loaded and cubed in its own pool worker; only the small
+    cubes come back and are merged in file order. Worker frames are spilled
+    to a temp dir for the consolidated ETA_Alert sheet. With per_file_dir,
+    each worker also writes <stem>_report.xlsx (and .pptx) for its file.
+    Per-file stages run in the workers, so stats (RunStats) has one 'files'
+    stage for the pool. fast_excel=None means on: the raw rows are written
+    from the spill files. Returns (excel_path, ppt_path, files).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if workers is not None and workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    stats = stats if stats is not None else RunStats()
+    if fast_excel is None:
+        fast_excel = True
+    files = resolve_batch_inputs(pattern)
+    if per_file_dir:
+        os.makedirs(per_file_dir, exist_ok=True)
+    workers = min(len(files), workers or os.cpu_count() or 1)
+    ppt_path = ppt_path_for(output_path) if make_ppt else None
+    with tempfile.TemporaryDirectory(prefix='ngo_alert_') as spill_dir:
+        spill_paths = [os.path.join(spill_dir, f"file_{i:05d}.pkl") for i in range(len(files))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_batch_worker, f, spill, use_kpi, norm_rules, norm_memo, all_columns, cache_dir,
+                            cache_max_bytes,
+                            os.path.join(per_file_dir, os.path.splitext(os.path.basename(f))[0] + '_report.xlsx')
+                            if per_file_dir else None,
+                            make_ppt, fast_excel, ppt_options, cluster, calendar)
+                for f, spill in zip(files, spill_paths)
+            ]
+            with stats.stage('files', len(files)) as counts:  # after submit: no sampler thread while forking
+                results = [future.result() for future in futures]
+                counts['rows_out'] = sum(rows for _, rows in results)
+
+        with stats.stage('aggregate', sum(len(cube) for cube, _ in results)) as counts:
+            cubes, offset = [], 0
+            for cube, rows in results:
+                cube['first_row'] += offset  # file order decides example_value, as in one long export
+                cubes.append(cube)
+                offset += rows
+            aggs = summarize_cube(merge_cubes(cubes, use_kpi), use_kpi, cluster)
+            counts['rows_out'] = len(aggs['cube'])
+        render_outputs(output_path, ppt_path, aggs, DetailSpill(spill_dir, spill_paths), fast_excel, raw_sidecar,
+                       parallel_render, ppt_options, stats)
+    return output_path, ppt_path, files
+
+
+def ask_report_paths():
+    """GUI file dialogs: (input_path, output_path), or None if either is cancelled."""
+    from tkinter import filedialog
+
+    file_path = filedialog.askopenfilename(title="Select alert export", filetypes=INPUT_FILETYPES)
+    if not file_path:
+        return None
+    output_path = filedialog.asksaveasfilename(defaultextension=".xlsx",filetypes=[("Excel files","*.xlsx *.xls")])
+    if not output_path:
+        return None
+    return file_path, output_path
+
+
+def start_report(file_path, output_path, use_kpi, events, cache_dir=None, stats_log=None):
+    """run_report() on a background thread, posting progress to the events queue.
+
+    Posts ('start' | 'stop', stage, record) for each stage, then one of
+    ('done', None, (excel_path, ppt_path)), ('cancelled', None, None) or
+    ('error', None, message). Returns the run's RunStats; its cancel() stops
+    the run at the next stage or chunk without leaving output files.
+    cache_dir reuses parsed exports (see load_cached()); stats_log, if set,
+    gets the run's JSON stats line. Nothing is written outside output_path
+    without them.
+    """
+    stats = RunStats(listener=lambda event, name, record: events.put((event, name, dict(record))))
+
+    def work():
+        try:
+            result = ('done', None, run_report(file_path, output_path, use_kpi, cache_dir=cache_dir, stats=stats))
+        except RunCancelled:
+            result = ('cancelled', None, None)
+        except Exception as e:
+            result = ('error', None, str(e))
+        if stats_log:
+            try:
+                log_run_stats(stats, stats_log, input=file_path, output=output_path, outcome=result[0])
+            except OSError:
+                pass  # the stats log is best effort; the report itself is done
+        events.put(result)
+
+    threading.Thread(target=work, name='ngo-alert-report', daemon=True).start()
+    return stats
 
 # ---------------------------
 # GUI
 # ---------------------------
-root = tk.Tk()
-root.title("Repeated NGO-Alert Report")
-root.geometry("760x420")
+# Stages that move the progress bar (in pipeline order); the deck is built
+# alongside the workbook and reported when it finishes.
+GUI_STEPS = ('ingest', 'normalize', 'classify', 'aggregate', 'excel summary', 'excel raw rows', 'excel app sheets',
+             'excel save')
+
+
+def run_gui(cache_dir=DEFAULT_CACHE_DIR, stats_log=None):
+    """The Tk window; cache_dir and stats_log are passed to start_report()."""
+    import queue
+    import tkinter as tk
+    from tkinter import messagebox, ttk
+
+    root = tk.Tk()
+    root.title("Repeated NGO-Alert Report")
+    root.geometry("760x480")
+
+    use_kpi_var = tk.BooleanVar(value=False)
+    events = queue.Queue()
+    run = {'stats': None, 'lines': [], 'closing': False}
+
+    tk.Label(root,text="Alert Grouping Logic",font=("Arial",13,"bold")).pack(pady=10)
+    tk.Checkbutton(root,text="Use KPI Name instead of Title",variable=use_kpi_var,font=("Arial",11)).pack()
+    buttons = tk.Frame(root)
+    buttons.pack(pady=20)
+    run_button = tk.Button(buttons,text="Select Excel and Process",font=("Arial",12),command=lambda: start())
+    run_button.pack(side='left',padx=5)
+    cancel_button = tk.Button(buttons,text="Cancel",font=("Arial",12),state='disabled',command=lambda: cancel())
+    cancel_button.pack(side='left',padx=5)
+    progress = ttk.Progressbar(root,length=600,maximum=len(GUI_STEPS))
+    progress.pack()
+    status = tk.Label(root,text="",font=("Arial",10))
+    status.pack(pady=5)
+    timings = tk.Listbox(root,width=80,height=12,font=("Courier",10))
+    timings.pack(pady=5)
+
+    def start():
+        if run['stats'] is not None:
+            return
+        paths = ask_report_paths()
+        if not paths:
+            return
+        timings.delete(0,'end')
+        run['lines'] = []
+        progress['value'] = 0
+        status['text'] = f"Processing {os.path.basename(paths[0])}"
+        run_button['state'], cancel_button['state'] = 'disabled', 'normal'
+        run['stats'] = start_report(*paths, use_kpi_var.get(), events, cache_dir, stats_log)
+
+    def cancel():
+        if run['stats'] is not None:
+            run['stats'].cancel()
+            cancel_button['state'] = 'disabled'
+            status['text'] = "Cancelling after the current stage..."
+
+    def show(name, record):
+        rows = '' if record['rows_out'] is None else f"{record['rows_out']:>12,} rows"
+        line = f"{name:<20}{record['wall_s']:>9.2f}s  {rows}"
+        if name in run['lines']:
+            i = run['lines'].index(name)
+            timings.delete(i)
+            timings.insert(i,line)
+        else:
+            run['lines'].append(name)
+            timings.insert('end',line)
+
+    def finish(kind, payload):
+        run['stats'] = None
+        run_button['state'], cancel_button['state'] = 'normal', 'disabled'
+        if run['closing']:
+            root.destroy()
+            return
+        if kind == 'done':
+            progress['value'] = len(GUI_STEPS)
+            status['text'] = "Done"
+            output_path, ppt_path = payload
+            messagebox.showinfo("Success",f"Report generated successfully.\nExcel: {output_path}\nPPT: {ppt_path}")
+        elif kind == 'cancelled':
+            progress['value'] = 0
+            status['text'] = "Cancelled - no report written"
+        else:
+            status['text'] = "Failed"
+            messagebox.showerror("Error", payload)
+
+    def poll():
+        while True:
+            try:
+                kind, name, payload = events.get_nowait()
+            except queue.Empty:
+                break
+            if kind in ('start', 'stop'):
+                step = name.split(' (')[0]
+                if kind == 'start' and step in GUI_STEPS:
+                    progress['value'] = GUI_STEPS.index(step)
+                    if cancel_button['state'] != 'disabled':
+                        status['text'] = f"Running: {name}"
+                show(name, payload)
+            else:
+                finish(kind, payload)
+                if run['closing']:
+                    return
+        root.after(100,poll)
+
+    def close():
+        if run['stats'] is None:
+            root.destroy()
+        else:
+            run['closing'] = True  # let the run stop at a stage boundary so no partial files are left
+            cancel()
+
+    root.protocol("WM_DELETE_WINDOW",close)
+    root.after(100,poll)
+    root.mainloop()
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {text!r}") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def _normalize_rules(text):
+    rules = tuple(r.strip() for r in text.split(',') if r.strip())
+    unknown = [r for r in rules if r not in NORMALIZE_RULES]
+    if not rules or unknown:
+        raise argparse.ArgumentTypeError(f"expected a comma-separated list from {sorted(NORMALIZE_RULES)}, got {text!r}")
+    return rules
+
+
+def _similarity(text):
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid float value: {text!r}") from None
+    if not 0 < value <= 1:
+        raise argparse.ArgumentTypeError(f"must be in (0, 1], got {value}")
+    return value
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Repeated NGO-Alert report (Excel + PPT).")
+    parser.add_argument('input', nargs='?', help="alert export (.xlsx, .csv or .parquet); omit to open the GUI")
+    parser.add_argument('-o', '--output', help="output workbook path (default: <input>_report.xlsx)")
+    parser.add_argument('--kpi', action='store_true', help="group by kpiName instead of title")
+    parser.add_argument('--no-ppt', action='store_true', help="write the workbook only (skips pptx import)")
+    parser.add_argument('--normalize', type=_normalize_rules, default=','.join(DEFAULT_NORMALIZE_RULES),
+                        help=f"comma-separated title placeholder rules from {sorted(NORMALIZE_RULES)} (default: num)")
+    parser.add_argument('--norm-memo', help="JSON file caching clean titles across runs")
+    parser.add_argument('--stream', action='store_true',
+                        help="read the export in row chunks (for files too large to load at once)")
+    parser.add_argument('--chunk-rows', type=_positive_int, default=CHUNK_ROWS, help=f"rows per chunk with --stream (default: {CHUNK_ROWS})")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help=f"parsed-input cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-max-mb', type=int, default=CACHE_MAX_BYTES // 1024 ** 2, help="evict cache entries beyond this size")
+    parser.add_argument('--no-cache', action='store_true', help="always parse the export from scratch")
+    parser.add_argument('--fast-excel', action='store_true', default=None,
+                        help="constant-memory, row-streaming workbook writer (default with --stream and --batch)")
+    parser.add_argument('--no-fast-excel', dest='fast_excel', action='store_false',
+                        help="keep the in-memory workbook writer with --stream and --batch")
+    parser.add_argument('--raw-sidecar', choices=SIDECAR_FORMATS,
+                        help="write the raw ETA_Alert rows to <output>_ETA_Alert.<fmt> instead of the workbook")
+    parser.add_argument('--ppt-template', action='store_true',
+                        help="draw header, logo and background once on the slide layout (smaller, faster deck)")
+    parser.add_argument('--ppt-top', type=_positive_int, metavar='N', help="only the N applications with the most alerts in the deck")
+    parser.add_argument('--ppt-grid', type=_positive_int, metavar='N', help="pack N applications per slide instead of two slides each")
+    parser.add_argument('--serial', action='store_true', help="build the workbook and the deck one after the other")
+    parser.add_argument('--store', help="SQLite aggregate store: ingest new alerts from input (if given) and report from the store")
+    parser.add_argument('--id-col', help="alert id column for de-duplication in the store (default: ipAddress+createdOn+title)")
+    parser.add_argument('--retain-days', type=_positive_int, metavar='N',
+                        help="with --store and an input, drop stored alerts older than the newest stored day minus N days")
+    parser.add_argument('--from', dest='date_from', help="first day (YYYY-MM-DD) of a --store report")
+    parser.add_argument('--to', dest='date_to', help="last day (YYYY-MM-DD) of a --store report")
+    parser.add_argument('--batch', metavar='DIR_OR_GLOB', help="consolidated report over every export in a directory or glob")
+    parser.add_argument('--per-file-dir', help="with --batch, also write one report per export into this directory")
+    parser.add_argument('--workers', type=_positive_int, help="with --batch, worker processes (default: one per file, up to CPU count)")
+    parser.add_argument('--all-columns', action='store_true',
+                        help="read every column of the export and keep them in the ETA_Alert sheet")
+    parser.add_argument('--cluster', type=_similarity, nargs='?', const=DEFAULT_CLUSTER_THRESHOLD, metavar='THRESHOLD',
+                        help="merge near-duplicate clean titles (MinHash/LSH) at this token similarity "
+                             f"(default when given without a value: {DEFAULT_CLUSTER_THRESHOLD})")
+    parser.add_argument('--calendar', metavar='CONFIG.json',
+                        help="business-hours calendar: per-application/category support windows, weekends, holidays")
+    parser.add_argument('--date-format',
+                        help="createdOn format (strftime, e.g. %%d-%%m-%%Y %%H:%%M) or 'excel' for serial dates; skips inference")
+    parser.add_argument('--stats-log', help="append the per-stage run stats JSON line to this file (default: stderr; the GUI logs nothing)")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="profile the run and keep the slowest stage: cProfile dump, or pyinstrument if PATH ends in .html")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.input is None and not args.store and not args.batch:
+        run_gui(None if args.no_cache else args.cache_dir, args.stats_log)
+        return 0
+    if args.batch and not args.output:
+        print("Error: --batch needs -o/--output for the consolidated workbook", file=sys.stderr)
+        return 2
+    if args.retain_days and not (args.store and args.input):
+        print("Error: --retain-days applies when ingesting an input into --store", file=sys.stderr)
+        return 2
+    output_path = args.output or os.path.splitext(args.input or args.store)[0] + '_report.xlsx'
+    norm_rules = args.normalize
+    args.ppt_options = {'template': args.ppt_template, 'top_n': args.ppt_top, 'grid': args.ppt_grid}
+    try:
+        stats = RunStats(args.profile)
+        args.calendar = load_calendar(args.calendar, args.date_format)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.store:
+            return _main_store(args, output_path, norm_rules, stats)
+        if args.batch:
+            return _main_batch(args, output_path, norm_rules, stats)
+        return _main_report(args, output_path, norm_rules, stats)
+    finally:
+        log_run_stats(stats, args.stats_log, input=args.input or args.batch or args.store, output=output_path)
+        if stats.profile:
+            print(f"Profile ({stats.slowest}): {stats.profile}")
+
+
+def _main_report(args, output_path, norm_rules, stats):
+    try:
+        output_path, ppt_path = run_report(args.input, output_path, args.kpi, make_ppt=not args.no_ppt,
+                                           norm_rules=norm_rules, norm_memo=args.norm_memo,
+                                           all_columns=args.all_columns, stream=args.stream,
+                                           chunk_rows=args.chunk_rows,
+                                           cache_dir=None if args.no_cache else args.cache_dir,
+                                           cache_max_bytes=args.cache_max_mb * 1024 ** 2,
+                                           fast_excel=args.fast_excel, raw_sidecar=args.raw_sidecar,
+                                           parallel_render=not args.serial, ppt_options=args.ppt_options,
+                                           stats=stats, cluster=args.cluster, calendar=args.calendar)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Excel: {output_path}")
+    if args.raw_sidecar:
+        print(f"Raw rows: {sidecar_path_for(output_path, args.raw_sidecar)}")
+    if ppt_path:
+        print(f"PPT: {ppt_path}")
+    return 0
+
 
-use_kpi_var = tk.BooleanVar(value=False)
+def _main_batch(args, output_path, norm_rules, stats):
+    try:
+        output_path, ppt_path, files = run_batch(args.batch, output_path, args.kpi, not args.no_ppt, norm_rules,
+                                                 args.norm_memo, args.all_columns,
+                                                 None if args.no_cache else args.cache_dir,
+                                                 args.cache_max_mb * 1024 ** 2, args.fast_excel, args.raw_sidecar,
+                                                 not args.serial, args.per_file_dir, args.workers,
+                                                 args.ppt_options, stats, args.cluster, args.calendar)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Files: {len(files)}")
+    print(f"Excel: {output_path}")
+    if ppt_path:
+        print(f"PPT: {ppt_path}")
+    return 0
+
+
+def _main_store(args, output_path, norm_rules, stats):
+    try:
+        if args.input:
+            with stats.stage('store update') as counts:
+                added, skipped = update_store(args.store, args.input, args.kpi, norm_rules, args.norm_memo,
+                                              args.id_col, args.chunk_rows, args.calendar, args.retain_days)
+                counts['rows_in'], counts['rows_out'] = added + skipped, added
+            print(f"Store: {added} new alerts, {skipped} already stored"
+                  + (f" or older than {args.retain_days} days" if args.retain_days else ""))
+        output_path, ppt_path = report_from_store(args.store, output_path, args.kpi, not args.no_ppt, norm_rules,
+                                                  args.date_from, args.date_to, args.fast_excel, not args.serial,
+                                                  args.ppt_options, stats, args.cluster, args.calendar)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Excel: {output_path}")
+    if ppt_path:
+        print(f"PPT: {ppt_path}")
+    return 0
 
-tk.Label(root,text="Alert Grouping Logic",font=("Arial",13,"bold")).pack(pady=10)
-tk.Checkbutton(root,text="Use KPI Name instead of Title",variable=use_kpi_var,font=("Arial",11)).pack()
-tk.Button(root,text="Select Excel and Process",font=("Arial",12),command=process_excel).pack(pady=25)
 
-root.mainloop()
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""Stage-by-stage benchmark for the Repeated NGO-Alert report.
+
+Generates synthetic alert exports with the real schema, runs each pipeline
+stage (ingest, normalize, classify, aggregate, Excel write, PPT write) and
+records wall time and peak RSS per stage (sampled from a thread;
+--tracemalloc reports Python-traced peaks instead, at a large slowdown).
+Results can be saved as a baseline (by default in the report's cache
+directory, as timings are machine-specific) and later runs compared
+against it on both time and peak memory:
+
+    python Alert_ETA_Benchmark.py --rows 10000,100000 --save-baseline
+    python Alert_ETA_Benchmark.py --rows 10000,100000        # exit 1 on regression
+    python Alert_ETA_Benchmark.py --check-app-scaling        # no per-application frame scans
+
+Runs headless; pptx/xlsxwriter are only imported by their stages.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import Alert_ETA_Auto_V7_PPT as report
+
+STAGES = ('ingest', 'normalize', 'classify', 'aggregate', 'excel', 'ppt')
+DEFAULT_BASELINE = os.path.join(report.DEFAULT_CACHE_DIR, 'alert_bench_baseline.json')
+
+# ---------------------------
+# Synthetic exports
+# ---------------------------
+TITLE_TEMPLATES = [
+    "CPU utilization {n}% on {host}",
+    "Memory usage above {n}% for process {n2}",
+    "Disk /dev/sd{c}{n2} usage {n}% on {host}",
+    "Service {svc} down on {ip}",
+    "Ping loss {n}% from {ip} to {host}",
+    "JVM heap {n}MB exceeds threshold on {host}",
+    "Interface eth{n2} flapping on {host}",
+    "Job {svc}-{n} failed with exit code {n2}",
+]
+CATEGORIES = ['Infra', 'Application', 'Database', 'Network', 'Middleware', 'Storage']
+ENVIRONMENTS = ['PROD', 'PROD', 'PROD', 'DR', 'REPLICA-01', 'UAT']
+UPD_CATEGORIES = ['OPEN', 'ACKNOWLEDGED', 'CLOSED', 'Suppressed by CR']
+ACK_STATUSES = ['Y', 'N', 'X', 'y', ' N ']
+
+
+def _zipf_choice(rng, size, n, skew=1.1):
+    """Indices in [0, n) where low ranks are much more frequent, like real alert volume."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+def generate_alerts(rows, apps=200, titles=2000, days=30, seed=0, start='2026-01-01'):
+    """Synthetic alert export with the columns the report reads.
+
+    apps / titles set the applicationName and raw title cardinality; alerts
+    are spread over `days` days from `start`.
+    """
+    rng = np.random.default_rng(seed)
+    hosts = [f"srv-{i:04d}.dc{i % 3}.example.net" for i in range(max(1, titles // 4))]
+    title_pool = np.array([
+        TITLE_TEMPLATES[i % len(TITLE_TEMPLATES)].format(
+            n=rng.integers(0, 100), n2=rng.integers(0, 16), c='abcd'[i % 4], host=hosts[i % len(hosts)],
+            svc=f"svc{i % 50}", ip=f"10.{i % 256}.{(i // 256) % 256}.{i % 7}")
+        for i in range(titles)
+    ], dtype=object)
+    kpi_pool = np.array([f"KPI_{i % 40}_{t.split()[0]}" for i, t in enumerate(title_pool)], dtype=object)
+    app_pool = np.array([f"APP_{i:04d}" for i in range(apps)], dtype=object)
+    ip_pool = np.array([f"10.{i // 256 % 256}.{i % 256}.{i % 250 + 1}" for i in range(apps * 4)], dtype=object)
+
+    title_idx = _zipf_choice(rng, rows, titles)
+    app_idx = _zipf_choice(rng, rows, apps)
+    return pd.DataFrame({
+        'alertId': np.arange(rows),
+        'ipAddress': ip_pool[app_idx * 4 + rng.integers(0, 4, rows)],
+        'title': title_pool[title_idx],
+        'kpiName': kpi_pool[title_idx],
+        'category': np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), rows)],
+        'applicationName': app_pool[app_idx],
+        'ackMetStatus': np.array(ACK_STATUSES, dtype=object)[rng.integers(0, len(ACK_STATUSES), rows)],
+        'createdOn': pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 86400, rows), unit='s'),
+        'environment': np.array(ENVIRONMENTS, dtype=object)[rng.integers(0, len(ENVIRONMENTS), rows)],
+        'latestUpdCategory': np.array(UPD_CATEGORIES, dtype=object)[rng.integers(0, len(UPD_CATEGORIES), rows)],
+    })
+
+
+def write_export(df, path):
+    """Write a generated export as .xlsx, .csv or .parquet (by extension)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in report.CSV_EXTS:
+        df.to_csv(path, index=False)
+    elif ext in report.PARQUET_EXTS:
+        df.to_parquet(path, index=False)
+    else:
+        if len(df) >= report.EXCEL_MAX_ROWS:
+            raise ValueError(f"{len(df)} rows do not fit in one xlsx sheet; use --format csv or parquet")
+        df.to_excel(path, index=False)
+    return path
+
+# ---------------------------
+# Stage runner
+# ---------------------------
+def _measure(func, traced=False):
+    """Run func(); return (result, seconds, peak MB above the starting point)."""
+    if traced:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - t0
+        return result, seconds, (tracemalloc.get_traced_memory()[1] - current) / 1024 ** 2
+    with report.PeakRss() as rss:
+        t0 = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - t0
+    return result, seconds, (rss.peak - rss.start) / 1024 ** 2
+
+
+def run_stages(input_path, out_dir, use_kpi=False, stages=STAGES, fast_excel=False, ppt_options=None,
+               traced=False, cluster=None, calendar=None):
+    """Time each pipeline stage on one export; returns {stage: {'seconds', 'peak_mb', 'rows'}}."""
+    logic_col, clean_col = report.logic_columns(use_kpi)
+    output_path = os.path.join(out_dir, 'bench_report.xlsx')
+    results = {}
+    _run = lambda func: _measure(func, traced)  # noqa: E731
+    if traced:
+        tracemalloc.start()
+    try:
+        df, secs, peak = _run(lambda: report.load_alerts(input_path, use_kpi))
+        results['ingest'] = {'seconds': secs, 'peak_mb': peak}
+
+        def normalize():
+            df[clean_col] = report.normalize_titles(df[logic_col])
+        _, secs, peak = _run(normalize)
+        results['normalize'] = {'seconds': secs, 'peak_mb': peak}
+
+        _, secs, peak = _run(lambda: report.classify_alerts(df, calendar))
+        results['classify'] = {'seconds': secs, 'peak_mb': peak}
+
+        aggs, secs, peak = _run(lambda: report.aggregate_alerts(df, use_kpi, cluster))
+        results['aggregate'] = {'seconds': secs, 'peak_mb': peak}
+
+        if 'excel' in stages:
+            _, secs, peak = _run(lambda: report.write_excel(output_path, aggs, df, fast_excel))
+            results['excel'] = {'seconds': secs, 'peak_mb': peak}
+        if 'ppt' in stages:
+            _, secs, peak = _run(lambda: report.render_ppt(report.ppt_path_for(output_path), aggs, ppt_options))
+            results['ppt'] = {'seconds': secs, 'peak_mb': peak}
+    finally:
+        if traced:
+            tracemalloc.stop()
+    for name in results:
+        results[name]['rows'] = len(df)
+    return results
+
+# ---------------------------
+# Application scaling guard
+# ---------------------------
+def _app_prep(aggs):
+    """The per-application lookups of the App_ sheets and slides."""
+    for _, app_df, biz in report.app_tables(aggs['app_issues'], aggs['app_business']):
+        app_df.head(10)
+        biz.rename_axis('Business').reset_index(name='count')
+
+
+# DataFrame / Series methods that scan a whole frame: boolean-mask selection
+# and groupby. Their call count over aggregation + per-app prep must not
+# depend on the number of applications.
+SCAN_METHODS = ('__getitem__', 'groupby', 'query')
+
+
+@contextlib.contextmanager
+def count_frame_scans():
+    """Count boolean-mask selections, groupbys and queries on any frame; yields the list of calls."""
+    calls, originals = [], []
+
+    def counting(cls, name, method):
+        def wrapper(self, *args, **kwargs):
+            key = args[0] if args else None
+            if name != '__getitem__' or (isinstance(key, (pd.Series, np.ndarray)) and key.dtype == bool):
+                calls.append((cls.__name__, name, len(self)))
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    for cls in (pd.DataFrame, pd.Series):
+        for name in SCAN_METHODS:
+            if hasattr(cls, name):
+                originals.append((cls, name, getattr(cls, name)))
+                setattr(cls, name, counting(cls, name, getattr(cls, name)))
+    try:
+        yield calls
+    finally:
+        for cls, name, method in originals:
+            setattr(cls, name, method)
+
+
+def check_app_scaling(rows=20000, few=10, many=400, use_kpi=False, seed=0):
+    """Count frame scans in aggregation and in the per-app prep for `few` vs `many` applications.
+
+    The same export is used for both runs with applicationName folded onto
+    `few` names, so only the number of applications differs. Returns
+    {apps: (aggregation scans, per-app scans)}; the per-app prep must scan
+    nothing and aggregation must scan the same number of times for both,
+    otherwise a per-application filter of the cube or the raw rows has
+    crept in (cost apps x rows). The counts do not depend on timing.
+    """
+    logic_col, clean_col = report.logic_columns(use_kpi)
+    base = generate_alerts(rows, apps=many, seed=seed)
+    app_codes = base['applicationName'].str[4:].astype(int).to_numpy()
+    counts = {}
+    for apps in (few, many):
+        df = base.copy()
+        df['applicationName'] = np.array([f"APP_{i:04d}" for i in range(many)], dtype=object)[app_codes % apps]
+        df = report._prepare_alerts(df, report.required_columns(logic_col))
+        df[clean_col] = report.normalize_titles(df[logic_col])
+        report.classify_alerts(df)
+        with count_frame_scans() as calls:
+            aggs = report.aggregate_alerts(df, use_kpi)
+        aggregate_scans = len(calls)
+        with count_frame_scans() as calls:
+            _app_prep(aggs)
+        counts[apps] = (aggregate_scans, len(calls))
+    return counts
+
+# ---------------------------
+# Baseline comparison
+# ---------------------------
+def compare(results, baseline, tolerance=0.25, mem_tolerance=0.25, min_seconds=0.25, min_mb=32):
+    """Stages slower or with a higher peak than baseline * (1 + tolerance).
+
+    Returns (run, stage, metric, before, now) tuples, metric being 'seconds'
+    or 'peak_mb'; timings under min_seconds and peaks under min_mb are too
+    noisy and ignored. Runs are matched on their key (rows, format and
+    generator knobs), so a baseline saved with other settings is simply
+    not compared.
+    """
+    checks = (('seconds', tolerance, min_seconds), ('peak_mb', mem_tolerance, min_mb))
+    regressions = []
+    for size, stages in results.items():
+        for stage, now in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            if not before:
+                continue
+            for metric, allowed, floor in checks:
+                if metric not in before or max(now[metric], before[metric]) < floor:
+                    continue
+                if now[metric] > before[metric] * (1 + allowed):
+                    regressions.append((size, stage, metric, before[metric], now[metric]))
+    return regressions
+
+
+def format_results(results, baseline=None):
+    lines = [f"{'run':<32} {'stage':<10} {'seconds':>9} {'peak MB':>9} {'base s':>9} {'base MB':>9}"]
+    for size, stages in results.items():
+        for stage, r in stages.items():
+            before = (baseline or {}).get(size, {}).get(stage)
+            base = f"{before['seconds']:9.3f} {before['peak_mb']:9.1f}" if before else f"{'-':>9} {'-':>9}"
+            lines.append(f"{size:<32} {stage:<10} {r['seconds']:9.3f} {r['peak_mb']:9.1f} {base}")
+    return "\n".join(lines)
+
+# ---------------------------
+# CLI
+# ---------------------------
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the NGO-Alert report pipeline on synthetic exports.")
+    parser.add_argument('--rows', default='10000,100000', help="comma-separated row counts (e.g. 10000,100000,1000000,5000000)")
+    parser.add_argument('--apps', type=int, default=200, help="distinct applicationName values")
+    parser.add_argument('--titles', type=int, default=2000, help="distinct raw titles")
+    parser.add_argument('--days', type=int, default=30, help="date span of createdOn")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=('parquet', 'csv', 'xlsx'), default='parquet', help="export format to ingest")
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"stages to run (ingest..aggregate always run): {','.join(STAGES)}")
+    parser.add_argument('--kpi', action='store_true', help="group by kpiName instead of title")
+    parser.add_argument('--calendar', metavar='CONFIG.json', help="business-hours calendar for the classify stage")
+    parser.add_argument('--cluster', type=report._similarity, metavar='THRESHOLD', help="merge near-duplicate titles in the aggregate stage")
+    parser.add_argument('--fast-excel', action='store_true', help="time the constant-memory workbook writer")
+    parser.add_argument('--ppt-top', type=report._positive_int, metavar='N', help="limit the deck to the top N applications")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per size; the fastest time is kept")
+    parser.add_argument('--tracemalloc', action='store_true', help="report Python-traced peak memory (much slower timings)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help=f"baseline JSON (default: {DEFAULT_BASELINE})")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument('--mem-tolerance', type=float, default=0.25,
+                        help="allowed peak memory growth vs baseline (0.25 = 25%%; peaks under 32 MB are ignored)")
+    parser.add_argument('--check-app-scaling', type=report._positive_int, nargs='?', const=20000, metavar='ROWS',
+                        help="check that no per-application code scans the cube or raw rows (10 vs 400 apps, "
+                             "default 20000 rows)")
+    parser.add_argument('--generate-only', metavar='PATH', help="write one synthetic export (first --rows value) and exit")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    sizes = [int(r) for r in args.rows.split(',') if r.strip()]
+    stages = tuple(s.strip() for s in args.stages.split(',') if s.strip())
+    ppt_options = {'top_n': args.ppt_top} if args.ppt_top else None
+    calendar = report.load_calendar(args.calendar)
+
+    if args.check_app_scaling:
+        counts = check_app_scaling(args.check_app_scaling, use_kpi=args.kpi, seed=args.seed)
+        for apps, (aggregate_scans, app_scans) in counts.items():
+            print(f"{apps} apps: {aggregate_scans} frame scans in aggregation, {app_scans} in per-app prep")
+        (few_aggregate, few_app), (many_aggregate, many_app) = counts.values()
+        if few_aggregate != many_aggregate or few_app or many_app:
+            print("REGRESSION app scaling: per-application work scans the cube or the raw rows", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.generate_only:
+        write_export(generate_alerts(sizes[0], args.apps, args.titles, args.days, args.seed), args.generate_only)
+        print(f"Export: {args.generate_only}")
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='ngo_alert_bench_') as tmp:
+        for rows in sizes:
+            path = write_export(generate_alerts(rows, args.apps, args.titles, args.days, args.seed),
+                                os.path.join(tmp, f"alerts_{rows}.{args.format}"))
+            key = f"{rows}:{args.format}:a{args.apps}:t{args.titles}:d{args.days}" + (':kpi' if args.kpi else '') \
+                + (f":c{args.cluster}" if args.cluster is not None else '') + (f":cal{calendar.signature}" if calendar else '') \
+                + (':tm' if args.tracemalloc else '')
+            runs = [run_stages(path, tmp, args.kpi, stages, args.fast_excel, ppt_options, args.tracemalloc,
+                               args.cluster, calendar)
+                    for _ in range(max(1, args.repeat))]
+            results[key] = {stage: {'seconds': min(r[stage]['seconds'] for r in runs),
+                                    'peak_mb': min(r[stage]['peak_mb'] for r in runs),
+                                    'rows': runs[0][stage]['rows']}
+                            for stage in runs[0]}
+            os.remove(path)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+    print(format_results(results, baseline))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as fh:
+            json.dump({**(baseline or {}), **results}, fh, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+        return 0
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance, args.mem_tolerance)
+        for size, stage, metric, before, now in regressions:
+            change = f"{before:.3f}s -> {now:.3f}s" if metric == 'seconds' else f"{before:.1f} MB -> {now:.1f} MB"
+            print(f"REGRESSION {size} / {stage}: {change}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())